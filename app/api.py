@@ -0,0 +1,190 @@
+"""
+ASGI service for uploading documents and generating quizzes in the background.
+
+Run from the app directory with several workers behind one front end, for example:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Indexed document sets are persisted and can be used by any worker. Jobs live in the worker that
+accepted them, so the front end has to route a job's requests back to that worker.
+
+Endpoints:
+    POST   /documents             Upload PDFs, returns a document_set_id once they are indexed
+    POST   /jobs                  Submit a quiz generation job (deduplicated by document set, topic and size)
+    GET    /jobs/{job_id}         Poll a job's status and the questions generated so far
+    GET    /jobs/{job_id}/stream  Stream the job's questions as server-sent events
+    DELETE /jobs/{job_id}         Cancel a queued or running job
+"""
+import asyncio
+import json
+import os
+import re
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from components import resources
+from components.chroma_collection import ChromaCollectionCreator
+from components.numpy_collection import NumpyCollectionCreator
+from components.document_processor import DocumentProcessor
+from components.job_queue import JobQueue
+from components.quiz_generator import QuizGenerator
+from components.resources import SessionCache
+
+EMBED_CONFIG = {
+    "model_name": os.environ.get("EMBEDDING_MODEL", "textembedding-gecko@003"),
+    "project": os.environ.get("PROJECT_ID", "sample-mission-421421"),
+    "location": os.environ.get("LOCATION", "us-central1"),
+    "cache_path": os.path.join(".cache", "embeddings.sqlite3"),
+    "backend": os.environ.get("QUIZIFY_EMBEDDING_BACKEND", "vertexai")
+}
+VECTOR_STORE = os.environ.get("QUIZIFY_VECTOR_STORE", "chroma")
+PERSIST_DIRECTORY = os.path.join(".cache", "vectors" if VECTOR_STORE == "numpy" else "chroma")
+NUM_WORKERS = int(os.environ.get("QUIZIFY_JOB_WORKERS", "2"))
+
+# Recently used document sets of this process, keyed by document_set_id. Every set is persisted, so a
+# set that was evicted or indexed by another worker process is opened again from disk when needed.
+document_sets = SessionCache(
+    idle_timeout=int(os.environ.get("QUIZIFY_DOCUMENT_SET_IDLE_TIMEOUT", "1800")),
+    max_sessions=int(os.environ.get("QUIZIFY_MAX_DOCUMENT_SETS", "16"))
+)
+
+
+class JobRequest(BaseModel):
+    document_set_id: str
+    topic: str = "General Knowledge"
+    num_questions: int = Field(default=5, ge=1, le=10)
+
+
+def create_collection_creator(processor=None):
+    """
+    Return a creator of the persistent collection shared by all document sets (and the Streamlit app).
+    """
+    creator_class = NumpyCollectionCreator if VECTOR_STORE == "numpy" else ChromaCollectionCreator
+    return creator_class(
+        processor or DocumentProcessor(),
+        resources.get_embedding_client(**EMBED_CONFIG),
+        persist_directory=PERSIST_DIRECTORY,
+        collection_name="quizify" if EMBED_CONFIG["backend"] == "vertexai" else f"quizify-{EMBED_CONFIG['backend']}",
+        show_status=False
+    )
+
+
+def get_document_set(document_set_id):
+    """
+    Return the collection creator of an indexed document set, opening the persisted collection when the
+    set isn't in this process's registry. Blocks on disk I/O, so it runs in a thread.
+
+    :return: The creator, or None if the document set was never indexed
+    """
+    if not re.fullmatch(r"[0-9a-f]{64}", document_set_id):
+        return None
+
+    def open_document_set():
+        chroma_creator = create_collection_creator()
+        return chroma_creator if chroma_creator.open_document_set(document_set_id) else None
+
+    chroma_creator = document_sets.get(document_set_id, "chroma_creator", open_document_set)
+    if chroma_creator is None:
+        document_sets.drop(document_set_id)
+    return chroma_creator
+
+
+async def run_job(job):
+    """
+    Generate the quiz of a job, yielding questions as they are produced.
+    """
+    chroma_creator = await asyncio.to_thread(get_document_set, job.params["document_set_id"])
+    if chroma_creator is None:
+        raise ValueError("Unknown document set.")
+    # The generator runs its blocking retrieval in a thread, off the event loop
+    generator = QuizGenerator(job.params["topic"], job.params["num_questions"], chroma_creator)
+    async for question in generator.astream_quiz():
+        yield question
+
+
+job_queue = JobQueue(run_job, num_workers=NUM_WORKERS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+
+
+app = FastAPI(title="Quizify", lifespan=lifespan)
+
+
+def index_documents(files):
+    """
+    Index uploaded PDFs in the persistent collection. Runs in a thread.
+    """
+    processor = DocumentProcessor()
+    processor.add_documents(files, lazy=True)
+    document_set_id = processor.document_set_id()
+
+    # Indexing is incremental, so documents indexed before (by any process) are only checked, not embedded again
+    chroma_creator = create_collection_creator(processor)
+    chroma_creator.create_chroma_collection()
+    document_sets.put(document_set_id, "chroma_creator", chroma_creator)
+    return document_set_id, len(processor.document_hashes)
+
+
+@app.post("/documents")
+async def upload_documents(files: List[UploadFile] = File(...)):
+    uploads = [(file.filename, await file.read()) for file in files]
+    document_set_id, num_documents = await asyncio.to_thread(index_documents, uploads)
+    return {"document_set_id": document_set_id, "documents": num_documents}
+
+
+@app.post("/jobs")
+async def submit_job(request: JobRequest):
+    if await asyncio.to_thread(get_document_set, request.document_set_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown document set.")
+
+    topic = " ".join(request.topic.split())
+    key = (request.document_set_id, topic.lower(), request.num_questions)
+    job = job_queue.submit(key, {
+        "document_set_id": request.document_set_id,
+        "topic": topic,
+        "num_questions": request.num_questions,
+    })
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+
+    async def events():
+        async for question in job_queue.updates(job):
+            yield f"event: question\ndata: {json.dumps(question)}\n\n"
+        yield f"event: {job.status}\ndata: {json.dumps({'error': job.error})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Unknown or finished job.")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"jobs": job_queue.stats(), "document_sets": document_sets.stats(), **resources.stats()}
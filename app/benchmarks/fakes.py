@@ -0,0 +1,146 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+# Words used to build synthetic question text, varied enough not to trip the near-duplicate index
+VOCABULARY = (
+    "atom cell energy force gravity light market motion orbit photon planet protein reaction "
+    "river rock signal species system theory velocity voltage wave enzyme climate contract "
+    "election empire fraction graph integer lattice matrix neuron poem ratio sonnet treaty"
+).split()
+
+
+class FakeEmbeddingClient:
+    """
+    A deterministic, offline stand-in for EmbeddingClient.
+
+    Texts are embedded by hashing their words into a fixed number of dimensions, so identical texts
+    always get identical vectors and similar texts get similar ones. Latency and error rate are
+    configurable to mimic the remote provider, including quota errors, which are retried by a
+    RateLimiter like the ones of the real client.
+    """
+
+    def __init__(self, dimensions=256, latency=0.0, per_text_latency=0.0, error_rate=0.0, seed=0,
+                 rate_limiter=None):
+        """
+        :param dimensions: Size of the produced vectors
+        :param latency: Seconds slept per call
+        :param per_text_latency: Additional seconds slept per embedded text
+        :param error_rate: Probability that a call raises a quota error
+        :param seed: Seed for the error injection
+        :param rate_limiter: Optional RateLimiter scheduling and retrying the calls
+        """
+        self.model_name = "fake-embedding"
+        self.dimensions = dimensions
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.error_rate = error_rate
+        self.rate_limiter = rate_limiter
+        self.calls = 0
+        self.call_latencies = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "big") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def _simulate_call(self, count):
+        if self.rate_limiter is not None:
+            return self.rate_limiter.call(self._simulate_request, count)
+        return self._simulate_request(count)
+
+    def _simulate_request(self, count):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        started = time.perf_counter()
+        time.sleep(self.latency + self.per_text_latency * count)
+        if fail:
+            raise RuntimeError("429 Quota exceeded for fake embedding model.")
+        with self._lock:
+            self.call_latencies.append(time.perf_counter() - started)
+
+    def embed_query(self, query):
+        self._simulate_call(1)
+        return self._vector(query)
+
+    def embed_documents(self, documents):
+        self._simulate_call(len(documents))
+        return [self._vector(text) for text in documents]
+
+
+class FakeLLM(LLM):
+    """
+    A deterministic, offline stand-in for the VertexAI LLM used by QuizGenerator.
+
+    It answers question prompts with well-formed quiz question JSON (a JSON array when the prompt asks
+    for several questions). Latency, error rate and the share of malformed responses are configurable.
+    Streaming returns the same response in chunks of chunk_size characters.
+    """
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    markdown: bool = True
+    seed: int = 0
+    chunk_size: int = 16
+    calls: int = 0
+    call_latencies: List[float] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-quiz-llm"
+
+    def _next_question(self, rng):
+        words = rng.sample(VOCABULARY, 6)
+        question = f"How does the {words[0]} relate to {words[1]} and {words[2]} in the context of {words[3]}?"
+        return {
+            "question": question,
+            "choices": [
+                {"key": key, "value": f"{key} {rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}"}
+                for key in "ABCD"
+            ],
+            "answer": rng.choice("ABCD"),
+            "explanation": f"The {words[4]} explains the {words[5]}.",
+        }
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        # Each call gets its own deterministic random stream
+        self.calls += 1
+        rng = random.Random(self.seed * 1_000_003 + self.calls)
+
+        started = time.perf_counter()
+        time.sleep(self.latency)
+        if rng.random() < self.error_rate:
+            raise RuntimeError("429 Quota exceeded for fake LLM.")
+        self.call_latencies.append(time.perf_counter() - started)
+
+        if rng.random() < self.malformed_rate:
+            return '{"question": "Truncated'
+
+        match = re.search(r"create (\d+) different quiz questions", prompt)
+        if match:
+            payload = json.dumps([self._next_question(rng) for _ in range(int(match.group(1)))], indent=2)
+        else:
+            payload = json.dumps(self._next_question(rng), indent=2)
+        return f"```json\n{payload}\n```" if self.markdown else payload
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        response = self._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+        for start in range(0, len(response), self.chunk_size):
+            yield GenerationChunk(text=response[start:start + self.chunk_size])
@@ -0,0 +1,192 @@
+"""
+Offline benchmark for the ingestion and quiz generation pipeline.
+
+Drives DocumentProcessor, ChromaCollectionCreator and QuizGenerator.generate_quiz over synthetic PDFs
+with deterministic fake embedding and LLM backends, and prints throughput, latency and memory figures
+as JSON. Run from the app directory:
+
+    python -m benchmarks.run_benchmark --pages 10 100 300 --output bench.json
+    python -m benchmarks.run_benchmark --baseline bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.fakes import FakeEmbeddingClient, FakeLLM
+from benchmarks.synthetic_pdf import make_pdf
+from components.chroma_collection import ChromaCollectionCreator
+from components.numpy_collection import NumpyCollectionCreator
+from components.document_processor import DocumentProcessor
+from components.embedding_client import EmbeddingClient
+from components.quiz_generator import QuizGenerator
+from components.rate_limiter import RateLimiter
+
+# Metrics where a larger value is better; everything else is compared as lower-is-better
+HIGHER_IS_BETTER = {"pages_per_sec", "chunks_per_sec", "questions_per_sec"}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(fraction * 100) - 1]
+
+
+def peak_rss_mb():
+    # ru_maxrss is the peak of the whole process lifetime, which is why every case runs in its own process.
+    # It is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(num_pages, args):
+    """
+    Benchmark ingestion and quiz generation over one synthetic PDF.
+    """
+    data = make_pdf(num_pages, seed=num_pages)
+
+    # Stage 1: PDF extraction, through the same lazy iter_pages path the ingestion pipeline consumes.
+    # Documents within the page cache limit are memoized here, larger ones are extracted again in stage 2
+    processor = DocumentProcessor(max_workers=args.workers)
+    processor.add_documents([(f"synthetic-{num_pages}.pdf", data)], lazy=True)
+    started = time.perf_counter()
+    for _ in processor.iter_pages():
+        pass
+    parse_seconds = time.perf_counter() - started
+
+    # Stage 2: Split, embed and insert into Chroma
+    if args.embedding_backend == "fake":
+        embed_client = FakeEmbeddingClient(
+            latency=args.embed_latency,
+            error_rate=args.embed_error_rate,
+            seed=num_pages,
+            # Injected quota errors are retried like the real client's, with short pauses
+            rate_limiter=RateLimiter(requests_per_minute=10 ** 6, max_retries=10, backoff=0.01, max_backoff=0.1)
+        )
+    else:
+        embed_client = EmbeddingClient(args.embedding_backend, backend=args.embedding_backend)
+    creator_class = NumpyCollectionCreator if args.vector_store == "numpy" else ChromaCollectionCreator
+    creator = creator_class(
+        processor,
+        embed_client,
+        collection_name=f"benchmark-{uuid.uuid4().hex}"
+    )
+    started = time.perf_counter()
+    creator.create_chroma_collection()
+    ingest_seconds = time.perf_counter() - started
+    chunks = creator.chunk_count()
+
+    # Stage 3: Quiz generation
+    llm = FakeLLM(
+        latency=args.llm_latency,
+        error_rate=args.llm_error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=num_pages
+    )
+    generator = QuizGenerator(args.topic, args.questions, creator)
+    generator.llm = llm
+    started = time.perf_counter()
+    questions = generator.generate_quiz()
+    generate_seconds = time.perf_counter() - started
+
+    return {
+        "pages": num_pages,
+        "chunks": chunks,
+        "questions": len(questions),
+        "pages_per_sec": num_pages / parse_seconds if parse_seconds else 0.0,
+        "chunks_per_sec": chunks / ingest_seconds if ingest_seconds else 0.0,
+        "questions_per_sec": len(questions) / generate_seconds if generate_seconds else 0.0,
+        "embed_latency_p50": percentile(getattr(embed_client, "call_latencies", []), 0.50),
+        "embed_latency_p95": percentile(getattr(embed_client, "call_latencies", []), 0.95),
+        "llm_latency_p50": percentile(llm.call_latencies, 0.50),
+        "llm_latency_p95": percentile(llm.call_latencies, 0.95),
+        "prompt_tokens_per_question": generator.prompt_tokens_per_question(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_case_isolated(num_pages, args):
+    """
+    Run one case in a fresh process, so its peak memory and caches don't carry over from earlier cases.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_case, num_pages, args).result()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline run and return the list of regressions.
+    """
+    regressions = []
+    baseline_cases = {case["pages"]: case for case in baseline["cases"]}
+    for case in results["cases"]:
+        previous = baseline_cases.get(case["pages"])
+        if not previous:
+            continue
+        for metric, value in case.items():
+            old = previous.get(metric)
+            if metric == "pages" or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append({
+                    "pages": case["pages"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": value,
+                    "change": change,
+                })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Quizify throughput benchmark.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100], help="Synthetic PDF sizes to run")
+    parser.add_argument("--questions", type=int, default=10, help="Questions generated per case")
+    parser.add_argument("--topic", default="Physics", help="Quiz topic")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes")
+    parser.add_argument("--embedding-backend", default="fake", choices=["fake", "hashing"],
+                        help="Embed with the fake client or a real local backend")
+    parser.add_argument("--vector-store", default="chroma", choices=["chroma", "numpy"], help="Index to benchmark")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per fake embedding call")
+    parser.add_argument("--embed-error-rate", type=float, default=0.0, help="Fake embedding quota error rate")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fake LLM error rate")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of malformed LLM responses")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {
+        "config": vars(args),
+        "cases": [run_case_isolated(num_pages, args) for num_pages in args.pages],
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        exit_code = 1 if results["regressions"] else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
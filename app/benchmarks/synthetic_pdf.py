@@ -0,0 +1,63 @@
+import random
+
+from benchmarks.fakes import VOCABULARY
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(num_pages, lines_per_page=40, words_per_line=12, seed=0) -> bytes:
+    """
+    Build a text-only PDF with the given number of pages of deterministic pseudo-random prose.
+    Every page carries the same header and a page number footer, like a typical textbook.
+
+    :param num_pages: Number of pages
+    :param lines_per_page: Number of text lines per page
+    :param words_per_line: Number of words per line
+    :param seed: Seed for the generated text
+    """
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_number in range(1, num_pages + 1):
+        lines = ["Synthetic Course Textbook"]
+        lines += [" ".join(rng.choice(VOCABULARY) for _ in range(words_per_line)) + "." for _ in range(lines_per_page)]
+        lines.append(f"Page {page_number}")
+
+        content = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        content += [f"({_escape(line)}) '" for line in lines]
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages, contents, font)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(output)
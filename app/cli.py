@@ -0,0 +1,188 @@
+"""
+Headless bulk quiz generation over a directory of PDFs.
+
+Every PDF is ingested into the persistent Chroma collection shared with the app, and a quiz is
+generated for every (PDF, topic) pair from that PDF's chunks. Results are appended to a JSONL file as they finish; the same file is the checkpoint, so an
+interrupted run picks up where it stopped when started again with the same output. Quizzes that came
+out with fewer questions than requested are not written, so the next run generates them again. Run
+from the app directory:
+
+    python cli.py course_pdfs/ --topics "Cell biology" "Genetics" --questions 20 --output bank.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from components import resources
+from components.chroma_collection import ChromaCollectionCreator
+from components.numpy_collection import NumpyCollectionCreator
+from components.document_processor import DocumentProcessor
+from components.embedding_backends import BACKENDS
+from components.question_index import QuestionIndex
+from components.quiz_generator import QuizGenerator
+
+# QuizGenerator produces at most this many questions per quiz
+MAX_QUESTIONS_PER_QUIZ = 10
+
+
+def load_checkpoint(path) -> set:
+    """
+    Return the (document hash, topic) pairs already written to the output file.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut off by an interrupted run is simply generated again
+                continue
+            done.add((record["doc_hash"], record["topic"]))
+    return done
+
+
+def ingest(path, args, embed_config):
+    """
+    Extract one PDF and index it in the persistent Chroma collection or vector index, restricting the
+    creator's searches to it.
+    """
+    # The file is memory mapped by the processor instead of being read into memory
+    processor = DocumentProcessor(max_workers=args.workers)
+    processor.add_documents([(os.path.basename(path), path)], lazy=True)
+    doc_hash = processor.document_hashes[0]
+
+    creator_class = NumpyCollectionCreator if args.vector_store == "numpy" else ChromaCollectionCreator
+    chroma_creator = creator_class(
+        processor,
+        resources.get_embedding_client(**embed_config),
+        persist_directory=args.persist_directory,
+        collection_name="quizify" if embed_config["backend"] == "vertexai" else f"quizify-{embed_config['backend']}",
+        show_status=False
+    )
+    chroma_creator.create_chroma_collection()
+    return doc_hash, chroma_creator
+
+
+def generate(chroma_creator, topic, num_questions) -> list:
+    """
+    Generate num_questions unique questions, in quizzes of at most MAX_QUESTIONS_PER_QUIZ questions
+    sharing one duplicate index.
+    """
+    question_index = QuestionIndex()
+    questions = []
+    while len(questions) < num_questions:
+        needed = min(MAX_QUESTIONS_PER_QUIZ, num_questions - len(questions))
+        generator = QuizGenerator(topic, needed, chroma_creator, question_index=question_index)
+        quiz = generator.generate_quiz()
+        if not quiz:
+            break
+        questions.extend(quiz)
+    return questions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate quiz question banks for a directory of PDFs.")
+    parser.add_argument("pdf_dir", help="Directory containing the PDF files")
+    parser.add_argument("--topics", nargs="+", required=True, help="Quiz topics")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per (PDF, topic)")
+    parser.add_argument("--output", default="question_bank.jsonl", help="JSONL output file, also used as checkpoint")
+    parser.add_argument("--ingest-workers", type=int, default=2, help="PDFs ingested at once")
+    parser.add_argument("--generate-workers", type=int, default=4, help="Quizzes generated at once")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes per document")
+    parser.add_argument("--persist-directory", default=os.path.join(".cache", "chroma"), help="Index directory")
+    parser.add_argument("--vector-store", default="chroma", choices=["chroma", "numpy"],
+                        help="Chroma collections, or in-process NumPy indexes for small PDFs")
+    parser.add_argument("--model-name", default="textembedding-gecko@003", help="Embedding model")
+    parser.add_argument("--embedding-backend", default="vertexai", choices=sorted(BACKENDS),
+                        help="Embedding backend, 'hashing' runs locally without Vertex AI")
+    parser.add_argument("--project", default="sample-mission-421421", help="Google Cloud project")
+    parser.add_argument("--location", default="us-central1", help="Google Cloud location")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    embed_config = {
+        "model_name": args.model_name,
+        "project": args.project,
+        "location": args.location,
+        "cache_path": os.path.join(".cache", "embeddings.sqlite3"),
+        "backend": args.embedding_backend
+    }
+
+    pdf_paths = sorted(
+        os.path.join(args.pdf_dir, name)
+        for name in os.listdir(args.pdf_dir)
+        if name.lower().endswith(".pdf")
+    )
+    if not pdf_paths:
+        print(f"No PDF files found in {args.pdf_dir}.")
+        return 1
+
+    done = load_checkpoint(args.output)
+    print(f"Found {len(pdf_paths)} PDFs, {len(done)} quizzes already in {args.output}.")
+
+    write_lock = threading.Lock()
+    failures = 0
+
+    with open(args.output, "a", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=args.ingest_workers) as ingest_pool, \
+            ThreadPoolExecutor(max_workers=args.generate_workers) as generate_pool:
+
+        # Step 1: Ingest the PDFs on a worker pool
+        ingest_futures = {ingest_pool.submit(ingest, path, args, embed_config): path for path in pdf_paths}
+
+        # Step 2: As each PDF is indexed, queue its pending quizzes
+        generate_futures = {}
+        for future in as_completed(ingest_futures):
+            path = ingest_futures[future]
+            try:
+                doc_hash, chroma_creator = future.result()
+            except Exception as error:
+                print(f"Failed to ingest {path}: {error}")
+                failures += 1
+                continue
+            for topic in args.topics:
+                if (doc_hash, topic) in done:
+                    continue
+                generate_future = generate_pool.submit(generate, chroma_creator, topic, args.questions)
+                generate_futures[generate_future] = (path, doc_hash, topic)
+
+        # Step 3: Write every quiz as soon as it is ready; a written line marks it as done
+        for future in as_completed(generate_futures):
+            path, doc_hash, topic = generate_futures[future]
+            try:
+                questions = future.result()
+            except Exception as error:
+                print(f"Failed to generate quiz for {path} / {topic}: {error}")
+                failures += 1
+                continue
+
+            if len(questions) < args.questions:
+                # Only complete quizzes are checkpointed, so the next run generates this one again
+                print(f"Generated only {len(questions)} of {args.questions} questions for "
+                      f"{os.path.basename(path)} / {topic}, not written.")
+                failures += 1
+                continue
+
+            record = {
+                "document": os.path.basename(path),
+                "doc_hash": doc_hash,
+                "topic": topic,
+                "questions": questions,
+            }
+            with write_lock:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+            print(f"Wrote {len(questions)} questions for {os.path.basename(path)} / {topic}.")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from components.metrics import metrics
+from components.rate_limiter import is_quota_error
+
+
+class BatchEmbedder:
+    """
+    Wraps an embedding client and embeds large lists of texts as concurrent batches.
+
+    Batches are run on a bounded thread pool. The batch size adapts to the provider: it grows while
+    batches finish under the target latency, shrinks when they are slow, and is halved on quota errors.
+    Retries and backoff after quota errors are left to the embedding client's RateLimiter, so a batch
+    that still fails fails the whole call.
+    The class exposes embed_documents/embed_query and can be passed anywhere an embedding model is expected.
+    """
+
+    def __init__(self, embed_model, batch_size=32, min_batch_size=4, max_batch_size=250,
+                 max_workers=4, target_latency=2.0):
+        """
+        :param embed_model: The embedding client used to embed each batch (e.g., EmbeddingClient)
+        :param batch_size: Initial number of texts per batch
+        :param min_batch_size: Lower bound for the adaptive batch size
+        :param max_batch_size: Upper bound for the adaptive batch size
+        :param max_workers: Maximum number of batches embedded at once
+        :param target_latency: Batch latency in seconds the batch size is tuned towards
+        """
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self.target_latency = target_latency
+
+    def embed_query(self, query):
+        return self.embed_model.embed_query(query)
+
+    def embed_documents(self, documents):
+        """
+        Embed a list of texts in concurrent, adaptively sized batches.
+        Returns the vectors in the same order as the input texts.
+        """
+        documents = list(documents)
+        results = [None] * len(documents)
+        cursor = 0
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while cursor < len(documents) or in_flight:
+                # Step 1: Keep up to max_workers batches running
+                while len(in_flight) < self.max_workers and cursor < len(documents):
+                    start, end = cursor, min(cursor + self.batch_size, len(documents))
+                    cursor = end
+                    in_flight[executor.submit(self._embed_batch, documents[start:end])] = (start, end)
+
+                # Step 2: Collect whichever batches finish first and adapt the batch size
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end = in_flight.pop(future)
+                    try:
+                        vectors, latency = future.result()
+                    except Exception as error:
+                        # The rate limiter already retried the call, only make the next batches smaller
+                        if is_quota_error(error):
+                            metrics.increment("embedding_quota_errors")
+                            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                        for pending in in_flight:
+                            pending.cancel()
+                        raise
+                    results[start:end] = vectors
+                    self._adapt(latency)
+
+        return results
+
+    def _embed_batch(self, texts):
+        started = time.perf_counter()
+        vectors = self.embed_model.embed_documents(texts)
+        if vectors is None or len(vectors) != len(texts):
+            raise RuntimeError("Embedding client returned an incomplete batch.")
+        latency = time.perf_counter() - started
+        metrics.observe("embedding_batch", latency)
+        return vectors, latency
+
+    def _adapt(self, latency):
+        if latency < self.target_latency:
+            self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+        elif latency > 2 * self.target_latency:
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
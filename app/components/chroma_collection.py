@@ -1,75 +1,124 @@
 import sys
 import os
+import threading
 import streamlit as st
 sys.path.append(os.path.abspath('../'))
-from components.document_processor import DocumentProcessor
-from components.embedding_client import EmbeddingClient
+from components.metrics import metrics
+from components.vector_collection import VectorCollectionCreator
 
-from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+# Chroma clients for a new persist directory can't be created by several threads at once
+_OPEN_LOCK = threading.Lock()
 
-class ChromaCollectionCreator:
-    def __init__(self, processor, embed_model):
+class ChromaCollectionCreator(VectorCollectionCreator):
+    """
+    Keeps the chunks of the uploaded documents in a (persistent) Chroma collection.
+    """
+
+    store_label = "Chroma Collection"
+
+    def __init__(self, processor, embed_model, **kwargs):
         """
         Initializes the ChromaCollectionCreator with a DocumemtProcessor instance and embedddings configuration.
         :param processor: An instance of DocumentProcessor that has processed documents.
         :param embed_model: An embedding client for embedding documents
+        :param kwargs: Other VectorCollectionCreator arguments
         """
-        self.processor = processor
-        self.embed_model = embed_model
+        super().__init__(processor, embed_model, **kwargs)
         self.db = None
-    
-    def create_chroma_collection(self):
-        """
-        Create a Chroma colection from the documents processed by the DocumentProcessor instance.
-        """
 
-        # Step 1: Check for processed documents
-        if len(self.processor.pages) == 0:
-            st.error("No documents found!", icon="🚨")
-            return
-        
-        # Step 2: Split documents into text chunks
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        texts = text_splitter.split_documents(self.processor.pages)
-
-        if texts is not None:
-            st.success(f"Successfully split pages in {len(texts)} documents!", icon="✅")
-
-        # Step 3: Create Chroma Collection
-        self.db = Chroma.from_documents(
-            texts,
-            self.embed_model
-        )
-
-        if self.db:
-            st.success("Successfully created Chorma Collection!", icon="✅")
-        else:
-            st.error("Failed to create Chroma Collection!", icon="🚨")
-
-    def query_chroma_collection(self, query) -> Document:
+    def is_open(self) -> bool:
+        return self.db is not None
+
+    def _collection_exists(self) -> bool:
+        if not self.persist_directory:
+            return False
+        import chromadb
+        import chromadb.config
+
+        # The same settings LangChain's Chroma uses, so the client is shared with the collections it opens
+        settings = chromadb.config.Settings(is_persistent=True)
+        settings.persist_directory = self.persist_directory
+        try:
+            with _OPEN_LOCK:
+                chromadb.Client(settings).get_collection(self.collection_name)
+        except Exception:
+            return False
+        return True
+
+    def _open_collection(self):
+        from langchain_community.vectorstores import Chroma
+        with _OPEN_LOCK:
+            self.db = Chroma(
+                collection_name=self.collection_name,
+                embedding_function=self.embed_model,
+                persist_directory=self.persist_directory
+            )
+
+    def _delete_document(self, doc_hash):
+        ids = self.db.get(where={"doc_hash": doc_hash})["ids"]
+        if ids:
+            self.db.delete(ids=ids)
+
+    def _upsert_chunks(self, chunks, vectors):
+        with metrics.span("chroma_upsert"):
+            self.db._collection.upsert(
+                ids=[chunk.metadata["chunk_id"] for chunk in chunks],
+                embeddings=vectors,
+                metadatas=[chunk.metadata for chunk in chunks],
+                documents=[chunk.page_content for chunk in chunks]
+            )
+        metrics.increment("chunks_indexed", len(chunks))
+
+    def stored_document_hashes(self) -> set:
+        if self.db is None:
+            return set()
+        metadatas = self.db.get(include=["metadatas"])["metadatas"]
+        return {metadata["doc_hash"] for metadata in metadatas if metadata and "doc_hash" in metadata}
+
+    def chunk_count(self) -> int:
+        return self.db._collection.count() if self.db is not None else 0
+
+    def _where(self):
         """
-        Queries the created Chroma Collection for documents similar to the query.
-        :param query: The query string to search for in the Chorma Collection
+        Return the Chroma filter restricting a search to the chunks of document_hashes.
         """
-        if self.db:
-            docs = self.db.similarity_search_by_vector_with_relevance_scores(query)
-            if docs:
-                return docs[0]
-            else:
-                st.error("No matching document found!", icon="🚨")
-        else:
-            st.error("Chroma Collection has not been created!", icon="🚨")
-
-    def as_retriever(self):
-        self.db.as_retriever()
+        return {"doc_hash": {"$in": list(self.document_hashes)}}
+
+    def similarity_search_with_relevance_scores(self, query, k=4) -> list:
+        if not self.document_hashes:
+            return []
+        return self.db.similarity_search_with_relevance_scores(query, k=k, filter=self._where())
+
+    def retrieve_with_vectors(self, query, k=20):
+        if self.db is None:
+            self._notify("error", f"{self.store_label} has not been created!", "🚨")
+            return None, []
+        if not self.document_hashes:
+            return None, []
+
+        from langchain_core.documents import Document
+
+        query_vector = self.embed_model.embed_query(query)
+        with metrics.span("chroma_query"):
+            result = self.db._collection.query(
+                query_embeddings=[query_vector],
+                n_results=k,
+                where=self._where(),
+                include=["documents", "metadatas", "embeddings"]
+            )
+        chunks = [
+            (Document(page_content=text, metadata=metadata or {}), list(vector))
+            for text, metadata, vector in zip(result["documents"][0], result["metadatas"][0], result["embeddings"][0])
+        ]
+        return query_vector, chunks
+
+    def as_retriever(self, k=4):
+        return self.db.as_retriever(search_kwargs={"k": k, "filter": self._where()})
 
 if __name__ == "__main__":
+    from components.document_processor import DocumentProcessor
+    from components.embedding_client import EmbeddingClient
+
     processor = DocumentProcessor() # Initialize from Task 3
     processor.ingest_documents()
     
@@ -0,0 +1,102 @@
+from components.metrics import metrics, estimate_tokens
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into the context of a prompt without exceeding a token budget.
+
+    Consecutive chunks of a document share their boundary text (the splitter's chunk overlap), so the
+    same sentences would be sent twice. The packer strips text that an already packed chunk contains
+    or overlaps with at its start or end, then adds the chunks in order of relevance while they fit in
+    the budget. Chunks that don't fit are skipped in favour of smaller, less relevant ones; a first chunk
+    larger than the whole budget is truncated.
+    """
+
+    def __init__(self, token_budget=768, length_function=estimate_tokens, min_overlap_chars=20,
+                 separator="\n\n"):
+        """
+        :param token_budget: Maximum number of tokens of the packed context
+        :param length_function: Callable returning the token count of a text
+        :param min_overlap_chars: Shortest shared prefix/suffix treated as overlap rather than coincidence
+        :param separator: Text placed between packed chunks
+        """
+        self.token_budget = token_budget
+        self.length_function = length_function
+        self.min_overlap_chars = min_overlap_chars
+        self.separator = separator
+
+    def _overlap(self, left, right) -> int:
+        """
+        Return the length of the longest suffix of left that is also a prefix of right.
+        """
+        probe = right[:self.min_overlap_chars]
+        if len(probe) < self.min_overlap_chars:
+            return 0
+        start = left.find(probe, max(0, len(left) - len(right)))
+        while start != -1:
+            if right.startswith(left[start:]):
+                return len(left) - start
+            start = left.find(probe, start + 1)
+        return 0
+
+    def _strip_overlap(self, text, packed) -> str:
+        """
+        Remove the parts of text already present in the packed chunks.
+        """
+        for other in packed:
+            if text in other:
+                return ""
+            overlap = self._overlap(other, text)
+            if overlap:
+                text = text[overlap:]
+            overlap = self._overlap(text, other)
+            if overlap:
+                text = text[:-overlap]
+        return text.strip()
+
+    def pack(self, scored_documents, token_budget=None) -> str:
+        """
+        Build the context from retrieved chunks.
+
+        :param scored_documents: List of (Document, relevance score) pairs
+        :param token_budget: Budget for this context, defaults to token_budget
+        :return: The packed chunk texts, most relevant first
+        """
+        budget = token_budget or self.token_budget
+        separator_tokens = self.length_function(self.separator)
+        ranked = sorted(scored_documents, key=lambda pair: pair[1], reverse=True)
+
+        packed = []
+        used = 0
+        for document, _ in ranked:
+            original = document.page_content.strip()
+            text = self._strip_overlap(original, packed)
+            metrics.increment("context_overlap_tokens_removed",
+                              self.length_function(original) - self.length_function(text))
+            if not text:
+                continue
+
+            cost = self.length_function(text) + (separator_tokens if packed else 0)
+            if used + cost > budget:
+                if packed:
+                    metrics.increment("context_chunks_over_budget")
+                    continue
+                text = self._truncate(text, budget)
+                cost = self.length_function(text)
+            packed.append(text)
+            used += cost
+        return self.separator.join(packed)
+
+    def _truncate(self, text, budget) -> str:
+        """
+        Cut a text at a word boundary so it fits in the budget.
+        """
+        words = text.split(" ")
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.length_function(" ".join(words[:middle])) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
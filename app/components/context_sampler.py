@@ -0,0 +1,69 @@
+import math
+
+
+def cosine_similarity(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ContextSampler:
+    """
+    Holds the chunks retrieved once for a quiz topic and hands every question a different slice of them.
+
+    Slices are picked with maximal marginal relevance (MMR): each pick trades relevance to the topic
+    against similarity to the chunks already in the slice. Chunks that were used by earlier questions
+    are penalized, so successive questions draw on different parts of the document.
+    """
+
+    def __init__(self, query_vector, chunks, lambda_mult=0.5, usage_penalty=0.3):
+        """
+        :param query_vector: Embedding of the quiz topic
+        :param chunks: List of (Document, vector) pairs retrieved for the topic
+        :param lambda_mult: Weight of relevance versus diversity, 1 favours relevance and 0 diversity
+        :param usage_penalty: Score subtracted per earlier question that already used a chunk
+        """
+        self.chunks = [document for document, _ in chunks]
+        self.vectors = [vector for _, vector in chunks]
+        self.relevance = [cosine_similarity(query_vector, vector) for vector in self.vectors]
+        self.lambda_mult = lambda_mult
+        self.usage_penalty = usage_penalty
+        self.usage = [0] * len(self.chunks)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def sample(self, k=4) -> list:
+        """
+        Pick the next slice of k chunks for a question.
+
+        :return: A list of Documents, most relevant first
+        """
+        return [document for document, _ in self.sample_scored(k)]
+
+    def sample_scored(self, k=4) -> list:
+        """
+        Pick the next slice of k chunks for a question, together with their relevance to the topic.
+
+        :return: A list of (Document, relevance) pairs, most relevant first
+        """
+        selected = []
+        candidates = set(range(len(self.chunks)))
+        while candidates and len(selected) < k:
+            def score(i):
+                redundancy = max(
+                    (cosine_similarity(self.vectors[i], self.vectors[j]) for j in selected),
+                    default=0.0
+                )
+                return (self.lambda_mult * self.relevance[i]
+                        - (1 - self.lambda_mult) * redundancy
+                        - self.usage_penalty * self.usage[i])
+
+            best = max(sorted(candidates), key=score)
+            selected.append(best)
+            candidates.remove(best)
+
+        for i in selected:
+            self.usage[i] += 1
+        selected.sort(key=lambda i: self.relevance[i], reverse=True)
+        return [(self.chunks[i], self.relevance[i]) for i in selected]
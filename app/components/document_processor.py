@@ -1,23 +1,184 @@
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+import hashlib
+import io
+import mmap
 import os
+import shutil
 import tempfile
-import uuid
+import threading
+from components.metrics import metrics
+
+# Extracted page texts keyed by document hash. Module state survives Streamlit reruns,
+# so a PDF that was already parsed in this process is never parsed again. It is shared by script,
+# job and ingest threads, so it is only accessed through _cached_pages and _cache_pages.
+_PAGE_CACHE = OrderedDict()
+_PAGE_CACHE_LOCK = threading.Lock()
+_PAGE_CACHE_SIZE = 32
+# Documents with more pages are streamed without being memoized, so the cache stays bounded
+_PAGE_CACHE_MAX_PAGES = 500
+
+# Number of pages extracted by a single worker task, and read through one PdfReader when streaming
+PAGES_PER_TASK = 25
+
+
+def _cached_pages(doc_hash):
+    """
+    Return the memoized page texts of a document and mark them as recently used, or None.
+    """
+    with _PAGE_CACHE_LOCK:
+        texts = _PAGE_CACHE.get(doc_hash)
+        if texts is not None:
+            _PAGE_CACHE.move_to_end(doc_hash)
+        return texts
+
+
+def _cache_pages(extracted, size=None):
+    """
+    Memoize the page texts of documents, then drop the least recently used documents beyond size
+    (_PAGE_CACHE_SIZE by default).
+    """
+    size = size or _PAGE_CACHE_SIZE
+    with _PAGE_CACHE_LOCK:
+        for doc_hash, texts in extracted.items():
+            _PAGE_CACHE[doc_hash] = texts
+            _PAGE_CACHE.move_to_end(doc_hash)
+        while len(_PAGE_CACHE) > size:
+            _PAGE_CACHE.popitem(last=False)
+
+
+def _open_source(source):
+    """
+    Return a seekable binary stream over a PDF source without copying it into memory.
+
+    :param source: The PDF as bytes, a file path (memory mapped) or a binary file object (e.g., an upload)
+    """
+    if isinstance(source, bytes):
+        # BytesIO shares the bytes object instead of copying it
+        return io.BytesIO(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    source.seek(0)
+    return source
+
+
+def _hash_source(source) -> str:
+    """
+    Return the SHA-256 of a PDF source, hashing files and uploads in place.
+    """
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    stream = _open_source(source)
+    if isinstance(stream, mmap.mmap):
+        with stream:
+            return hashlib.sha256(stream).hexdigest()
+    if hasattr(stream, "getbuffer"):
+        with stream.getbuffer() as view:
+            return hashlib.sha256(view).hexdigest()
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1 << 20), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _task_path(source):
+    """
+    Provide a file path of a PDF source to send to worker processes instead of its contents, which
+    would be pickled into every task. Bytes and file objects (e.g., uploads) are spilled to a
+    temporary file, which is removed on exit; paths are used as they are.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield source
+        return
+
+    with tempfile.NamedTemporaryFile(prefix="quizify-", suffix=".pdf", delete=False) as file:
+        if isinstance(source, bytes):
+            file.write(source)
+        else:
+            source.seek(0)
+            shutil.copyfileobj(source, file, 1 << 20)
+    try:
+        yield file.name
+    finally:
+        os.remove(file.name)
+
+
+def _pdf_reader(source):
+    # pypdf is only imported once a PDF is actually read
+    from pypdf import PdfReader
+    return PdfReader(_open_source(source))
+
+
+def _has_text(page) -> bool:
+    """
+    Cheaply tell whether a page can contain text, without parsing its content stream. Pages without
+    content are blank, and pages that declare no fonts and no form XObjects (e.g., scanned images)
+    have nothing to extract.
+    """
+    if page.get("/Contents") is None:
+        return False
+    resources = page.get("/Resources")
+    if resources is None:
+        return True
+    resources = resources.get_object()
+    if "/Font" in resources:
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return False
+    return any(xobject.get_object().get("/Subtype") == "/Form" for xobject in xobjects.get_object().values())
+
+
+def _extract_text(page) -> str:
+    if not _has_text(page):
+        return ""
+    return page.extract_text() or ""
+
+
+def _extract_page_range(source, start, end):
+    """
+    Extract the text of pages [start, end) from a PDF source. Runs inside a worker process.
+    """
+    reader = _pdf_reader(source)
+    return [_extract_text(reader.pages[i]) for i in range(start, end)]
+
 
 class DocumentProcessor:
     """
     This class encapsulates the functionality for processing uploaded PDF documents using Streamlit
-    and LangChain's PyPDFLoader. IT provides a method to render a file uploader widget, process the 
+    and pypdf. IT provides a method to render a file uploader widget, process the
     uploaded PDF files, extract their pages, and display the total number of pages extracted.
+
+    Pages are extracted straight from the uploaded bytes and spread across a process pool, and the
+    extracted text is memoized per document hash so reruns don't parse the same PDF again.
+
+    Uploads and files are read in place (file paths are memory mapped) instead of being copied into
+    memory. Worker processes get a file path to memory map, uploads are spilled to a temporary file
+    for them first. In lazy mode pages are streamed by iter_pages: ranges of PAGES_PER_TASK pages are extracted
+    on the process pool with a bounded number of ranges in flight, so memory stays bounded by a small
+    window of pages even for very large documents. Blank and image-only pages are skipped without
+    parsing their content.
     """
 
-    def __init__(self):
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: Maximum number of extraction processes, defaults to the number of cores
+        """
         self.pages = [] # List to keep track of pages from all documents
+        self.document_hashes = [] # Content hash of every uploaded document, in upload order
+        self.documents = {} # Uploaded (name, source) keyed by document hash
+        self.max_workers = max_workers or os.cpu_count() or 1
 
-    def ingest_documents(self):
+    def ingest_documents(self, lazy=False):
         """
         Renders a file uploader in Streamlit app, processes uploaded PDF file,
         extracts their pages, and upadtes the self.pages list with the total number of pages.
+
+        :param lazy: If True, only register the uploads; pages are extracted on demand by iter_pages
         """
 
         # Render a file uploader widget
@@ -28,28 +189,227 @@ class DocumentProcessor:
         )
 
         if uploaded_files is not None:
-            for file in uploaded_files:
-                # Generate a unique identifier to append to the file's original name
-                unique_id = uuid.uuid4().hex
-                original_name, file_extension = os.path.splitext(file.name)
-                temp_file_name = f"{original_name}_{unique_id}{file_extension}"
-                temp_file_path = os.path.join(tempfile.gettempdir(), temp_file_name)
+            # The uploaded files are read in place, without copying them with getvalue()
+            self.add_documents(
+                [(file.name, file) for file in uploaded_files],
+                lazy=lazy
+            )
+
+            # Display the total number of pages processed
+            if lazy:
+                st.write(f"Total documents uploaded: {len(self.document_hashes)}")
+            else:
+                st.write(f"Total pages processed: {len(self.pages)}")
+
+    def add_documents(self, files, lazy=False):
+        """
+        Register PDF documents and, unless lazy, extract their pages into self.pages.
+        This is the part of ingest_documents that doesn't depend on the Streamlit uploader.
 
-                # Write the uploaded PDF to temporary file
-                with open(temp_file_path, 'wb') as f:
-                    f.write(file.getvalue())
+        :param files: List of (file name, source) tuples, where the source is the PDF as bytes,
+                      a file path or a binary file object
+        :param lazy: If True, only register the documents; pages are extracted on demand by iter_pages
+        """
+        documents = []
+        for name, source in files:
+            doc_hash = _hash_source(source)
+            # Skip files that were uploaded more than once
+            if doc_hash in self.document_hashes:
+                continue
+            self.document_hashes.append(doc_hash)
+            self.documents[doc_hash] = (name, source)
+            documents.append((name, doc_hash, source))
 
-                # Process the temporary file
-                loader = PyPDFLoader(temp_file_path)
+        if lazy:
+            return
 
-                # Add the extracted pages to the 'pages' list
-                self.pages.extend(loader.load_and_split())
+        # Extract every document that isn't memoized yet
+        with metrics.span("pdf_parse"):
+            texts_by_hash = self._extract_missing(documents)
 
-                # Clean up by deleting the temp file
-                os.unlink(temp_file_path)
-            # Display the total number of pages processed
-            st.write(f"Total pages processed: {len(self.pages)}")
+        from langchain_core.documents import Document
+
+        # Build page documents tagged with their source and document hash
+        for name, doc_hash, _ in documents:
+            for page_number, text in enumerate(texts_by_hash[doc_hash]):
+                if not text.strip():
+                    continue
+                self.pages.append(Document(
+                    page_content=text,
+                    metadata={"source": name, "page": page_number, "doc_hash": doc_hash}
+                ))
+
+    def document_set_id(self) -> str:
+        """
+        Return an id of the uploaded document set that doesn't depend on the upload order.
+        """
+        return hashlib.sha256("".join(sorted(self.document_hashes)).encode("utf-8")).hexdigest()
+
+    def iter_pages(self, doc_hashes=None):
+        """
+        Lazily yield page Documents of the uploaded documents, one page at a time, skipping pages without text.
+        Memoized documents are served from the page cache; others are extracted as they are consumed.
+        Documents of up to _PAGE_CACHE_MAX_PAGES pages are memoized once they were read completely,
+        larger ones are never kept, so only a window of their pages is held in memory.
+
+        :param doc_hashes: Optional list of document hashes to restrict the pages to
+        """
+        from langchain_core.documents import Document
+
+        for doc_hash in doc_hashes if doc_hashes is not None else self.document_hashes:
+            name, source = self.documents[doc_hash]
+            memoized = None
+            cached = _cached_pages(doc_hash)
+            if cached is not None:
+                metrics.increment("page_cache_hits")
+                texts = enumerate(cached)
+            else:
+                metrics.increment("page_cache_misses")
+                texts = self._stream_page_texts(source)
+                memoized = []
+
+            for page_number, text in texts:
+                if memoized is not None:
+                    memoized.append(text)
+                    if len(memoized) > _PAGE_CACHE_MAX_PAGES:
+                        memoized = None
+                if not text.strip():
+                    continue
+                yield Document(
+                    page_content=text,
+                    metadata={"source": name, "page": page_number, "doc_hash": doc_hash}
+                )
+
+            if memoized is not None:
+                _cache_pages({doc_hash: memoized})
+
+    def _stream_page_texts(self, source):
+        """
+        Yield (page number, text) for every page of a PDF source, in page order.
+
+        A document of several PAGES_PER_TASK ranges is extracted on the process pool, with at most two
+        ranges per worker in flight, and every range is read by a fresh reader. Otherwise the pages are
+        read in this process, since starting worker processes would cost more than they save.
+        """
+        reader = _pdf_reader(source)
+        page_count = len(reader.pages)
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+
+        if len(ranges) <= 1 or self.max_workers == 1:
+            for start, end in ranges:
+                if start:
+                    # Drop the objects pypdf parsed and cached for the earlier pages
+                    reader = _pdf_reader(source)
+                for page_number in range(start, end):
+                    yield page_number, self._extract_page(reader.pages[page_number])
+            return
+
+        del reader
+        # Workers receive a file path and memory map it, rather than a copy of the file in every task
+        paths = ExitStack()
+        task_source = paths.enter_context(_task_path(source))
+        workers = min(self.max_workers, len(ranges))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        remaining = deque(ranges)
+        pending = deque()
+
+        def submit_next():
+            start, end = remaining.popleft()
+            pending.append((start, end, executor.submit(_extract_page_range, task_source, start, end)))
+
+        try:
+            while remaining and len(pending) < 2 * workers:
+                submit_next()
+
+            while pending:
+                start, end, future = pending.popleft()
+                with metrics.span("pdf_parse_range"):
+                    texts = future.result()
+                if remaining:
+                    submit_next()
+                metrics.increment("pages_parsed", end - start)
+                for offset, text in enumerate(texts):
+                    yield start + offset, text
+        finally:
+            # Stop extracting ranges nobody will read when the consumer stops early
+            executor.shutdown(wait=False, cancel_futures=True)
+            paths.close()
+
+    @staticmethod
+    def _extract_page(page) -> str:
+        if not _has_text(page):
+            metrics.increment("pages_skipped")
+            return ""
+        with metrics.span("pdf_parse_page"):
+            text = page.extract_text() or ""
+        metrics.increment("pages_parsed")
+        return text
+
+    def page_count(self, doc_hashes=None) -> int:
+        """
+        Return the total number of pages of the uploaded documents without extracting any text.
+
+        :param doc_hashes: Optional list of document hashes to restrict the count to
+        """
+        total = 0
+        for doc_hash in doc_hashes if doc_hashes is not None else self.document_hashes:
+            cached = _cached_pages(doc_hash)
+            if cached is not None:
+                total += len(cached)
+            else:
+                total += len(_pdf_reader(self.documents[doc_hash][1]).pages)
+        return total
+
+    def _extract_missing(self, documents):
+        """
+        Extract the page texts of all documents missing from the page cache, splitting large
+        documents into page ranges so both files and pages are spread across the process pool.
+
+        :return: The page texts of every document, memoized or extracted, keyed by document hash
+        """
+        tasks = []
+        extracted = {}
+        texts_by_hash = {}
+        for _, doc_hash, source in documents:
+            cached = _cached_pages(doc_hash)
+            if cached is not None:
+                metrics.increment("page_cache_hits")
+                texts_by_hash[doc_hash] = cached
+                continue
+            metrics.increment("page_cache_misses")
+            page_count = len(_pdf_reader(source).pages)
+            for start in range(0, page_count, PAGES_PER_TASK):
+                tasks.append((doc_hash, source, start, min(start + PAGES_PER_TASK, page_count)))
+            extracted[doc_hash] = [None] * page_count
+
+        if not tasks:
+            _cache_pages(extracted, size=max(_PAGE_CACHE_SIZE, len(documents)))
+            return {**texts_by_hash, **extracted}
+
+        # A single task isn't worth the cost of starting worker processes
+        if len(tasks) == 1 or self.max_workers == 1:
+            results = [_extract_page_range(source, start, end) for _, source, start, end in tasks]
+        else:
+            # Workers receive file paths rather than a copy of the file in every task
+            with ExitStack() as paths:
+                task_sources = {}
+                for doc_hash, source, _, _ in tasks:
+                    if doc_hash not in task_sources:
+                        task_sources[doc_hash] = paths.enter_context(_task_path(source))
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                    futures = [
+                        executor.submit(_extract_page_range, task_sources[doc_hash], start, end)
+                        for doc_hash, _, start, end in tasks
+                    ]
+                    results = [future.result() for future in futures]
+
+        for (doc_hash, _, start, end), texts in zip(tasks, results):
+            extracted[doc_hash][start:end] = texts
+            metrics.increment("pages_parsed", end - start)
+        # Every document of this call stays memoized, even when there are more than _PAGE_CACHE_SIZE
+        _cache_pages(extracted, size=max(_PAGE_CACHE_SIZE, len(documents)))
+        return {**texts_by_hash, **extracted}
 
 if __name__ == "__main__":
     processor = DocumentProcessor()
-    processor.ingest_documents()
\ No newline at end of file
+    processor.ingest_documents()
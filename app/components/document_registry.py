@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+INGESTING = "ingesting"
+COMPLETE = "complete"
+
+
+class DocumentRegistry:
+    """
+    An SQLite sidecar of a collection recording which documents are being ingested and which are
+    completely indexed.
+
+    Completion is recorded here rather than on a chunk, so documents without chunks (no extractable
+    text, or only duplicate chunks) are recorded too, and a document only counts as indexed once the
+    ingestion that stored its chunks finished. An ingestion claims its documents with a lease that it
+    renews while it makes progress, so other sessions and processes sharing the collection can tell
+    an ingestion in progress from one that was interrupted.
+
+    Every use of a document refreshes its last_used time, so documents nobody used for a while can be
+    cleaned up. The registry also maps document set ids to their documents, so a set indexed by one
+    process can be opened by another.
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        :param path: Path of the SQLite file, usually next to the collection, in memory by default
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Statements run in autocommit mode unless they are grouped by transaction()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_hash TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                updated REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS document_sets (
+                set_id TEXT PRIMARY KEY,
+                doc_hashes TEXT NOT NULL
+            );
+            """
+        )
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the enclosed registry calls, and the store changes made along with them, as one write
+        transaction. The transaction holds SQLite's write lock, so it also serializes them with the
+        transactions of other processes using the same registry file.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def claim(self, doc_hashes):
+        """
+        Record that the documents are being ingested, starting their lease.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, 0, ?, ?)",
+                [(doc_hash, INGESTING, now, now) for doc_hash in doc_hashes]
+            )
+
+    def renew(self, doc_hashes):
+        """
+        Extend the lease of documents that are still being ingested.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE documents SET updated = ? WHERE doc_hash = ? AND status = ?",
+                [(now, doc_hash, INGESTING) for doc_hash in doc_hashes]
+            )
+
+    def mark_complete(self, doc_hash, chunks):
+        """
+        Record that every chunk of a document is stored.
+
+        :param chunks: Number of chunks stored for the document, possibly 0
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)", (doc_hash, COMPLETE, chunks, now, now)
+            )
+
+    def touch(self, doc_hashes):
+        """
+        Record that the documents are in use, postponing their cleanup.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE documents SET last_used = ? WHERE doc_hash = ?", [(now, doc_hash) for doc_hash in doc_hashes]
+            )
+
+    def complete_hashes(self) -> set:
+        """
+        Return the hashes of the documents recorded as completely indexed.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_hash FROM documents WHERE status = ?", (COMPLETE,)).fetchall()
+        return {doc_hash for doc_hash, in rows}
+
+    def interrupted_hashes(self, lease_seconds) -> set:
+        """
+        Return the hashes of the documents whose ingestion didn't renew its lease within lease_seconds.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_hash FROM documents WHERE status = ? AND updated < ?",
+                (INGESTING, time.time() - lease_seconds)
+            ).fetchall()
+        return {doc_hash for doc_hash, in rows}
+
+    def unused_hashes(self, ttl_seconds) -> set:
+        """
+        Return the hashes of the indexed documents that weren't used within ttl_seconds.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_hash FROM documents WHERE status = ? AND last_used < ?",
+                (COMPLETE, time.time() - ttl_seconds)
+            ).fetchall()
+        return {doc_hash for doc_hash, in rows}
+
+    def add_document_set(self, set_id, doc_hashes):
+        """
+        Record the documents of a document set.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO document_sets VALUES (?, ?)", (set_id, ",".join(doc_hashes)))
+
+    def document_set(self, set_id):
+        """
+        Return the document hashes of a document set, or None if the set isn't recorded.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT doc_hashes FROM document_sets WHERE set_id = ?", (set_id,)).fetchone()
+        return row[0].split(",") if row is not None else None
+
+    def forget(self, doc_hash):
+        """
+        Remove a document's record and the document sets containing it, e.g., after its chunks were deleted.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute("DELETE FROM document_sets WHERE instr(doc_hashes, ?) > 0", (doc_hash,))
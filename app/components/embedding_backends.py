@@ -0,0 +1,80 @@
+import re
+import zlib
+
+
+class HashingEmbeddings:
+    """
+    A fast local embedding backend that needs no model download and no network access.
+
+    Texts are tokenized into word unigrams and bigrams, hashed into a fixed number of dimensions with
+    a signed hash (the "hashing trick"), weighted with sublinear term frequency and L2 normalized, so
+    cosine similarity reflects lexical overlap. No corpus statistics are kept, which keeps the vectors
+    of a text identical no matter when or in which process it is embedded.
+    """
+
+    def __init__(self, dimensions=512, ngram_range=(1, 2), **_):
+        """
+        :param dimensions: Size of the produced vectors
+        :param ngram_range: Smallest and largest word n-gram hashed into the vector
+        """
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _features(self, text):
+        words = re.findall(r"\w+", text.lower())
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(words) - n + 1):
+                yield " ".join(words[i:i + n])
+
+    def _vector(self, text):
+        import numpy as np
+
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+            dtype=np.uint64
+        )
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if hashes.size:
+            indices = (hashes % self.dimensions).astype(np.int64)
+            # The top hash bit decides the sign so colliding features tend to cancel out
+            signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+            np.add.at(vector, indices, signs)
+            # Sublinear term frequency dampens words repeated many times
+            vector = np.sign(vector) * np.log1p(np.abs(vector))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, documents):
+        return [self._vector(text) for text in documents]
+
+    def embed_query(self, query):
+        return self._vector(query)
+
+
+def _vertexai(model_name, project, location, **options):
+    from langchain_google_vertexai import VertexAIEmbeddings
+    return VertexAIEmbeddings(model_name=model_name, project=project, location=location, **options)
+
+
+def _hashing(model_name=None, project=None, location=None, **options):
+    return HashingEmbeddings(**options)
+
+
+# Available embedding backends by name. Each factory takes the model name, project and location
+# plus backend specific options, and returns an object with embed_documents/embed_query.
+BACKENDS = {
+    "vertexai": _vertexai,
+    "hashing": _hashing,
+}
+
+
+def create_backend(backend, model_name=None, project=None, location=None, **options):
+    """
+    Create the embedding backend registered under a name.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {sorted(BACKENDS)}.")
+    return BACKENDS[backend](model_name=model_name, project=project, location=location, **options)
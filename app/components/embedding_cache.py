@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+
+class EmbeddingCache:
+    """
+    A disk-backed, content-addressed cache for embedding vectors. Each vector is stored in a SQLite
+    table keyed by the embedding model name and the SHA-256 hash of the embedded text, so re-ingesting
+    the same document never pays for the same embedding twice. The cache is bounded by a maximum number
+    of entries and evicts the least recently used vectors once that bound is exceeded.
+    """
+
+    def __init__(self, path, max_entries=100_000):
+        """
+        Open (or create) the cache database.
+
+        :param path: Path of the SQLite file backing the cache
+        :param max_entries: Maximum number of vectors kept before least recently used ones are evicted
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text):
+        """
+        Return the content hash used as the cache key for a piece of text.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name, texts):
+        """
+        Look up the cached vectors for a list of texts.
+
+        :param model_name: Name of the embedding model the vectors were produced by
+        :param texts: List of texts to look up
+        :return: A list aligned with texts, holding a vector for every hit and None for every miss
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            unique_hashes = list(dict.fromkeys(hashes))
+            # SQLite limits the number of bound parameters, so look up in slices
+            for start in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    [model_name, *chunk]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("d", blob).tolist()
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model_name = ? AND text_hash = ?",
+                    [(now, model_name, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model_name, texts, vectors):
+        """
+        Store freshly computed vectors and evict the least recently used entries if the cache is full.
+
+        :param model_name: Name of the embedding model the vectors were produced by
+        :param texts: List of texts that were embedded
+        :param vectors: List of vectors aligned with texts
+        """
+        now = time.time()
+        rows = [
+            (model_name, self.text_hash(text), array("d", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_name, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Delete the least recently used vectors until the cache is within max_entries.
+        """
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+
+    def stats(self):
+        """
+        Return the hit/miss counters and current size of the cache.
+        """
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,32 +1,106 @@
-from langchain_google_vertexai import VertexAIEmbeddings
+from components.embedding_backends import create_backend
+from components.embedding_cache import EmbeddingCache
+from components.metrics import metrics, estimate_tokens
+from components.rate_limiter import rate_limiter as shared_rate_limiter, BULK, INTERACTIVE
 
 
 class EmbeddingClient:
     """
     The EmbeddingClient class capable of intitializing and embedding client with specific configurations
     for model name, project, and location.
+
+    When a cache_path is provided, embeddings are memoized on disk keyed by the model name and the hash
+    of the embedded text, so only texts that were never embedded before are sent to the backend.
+
+    The backend is chosen by name from components.embedding_backends: "vertexai" (the default) calls
+    the Vertex AI embedding API, "hashing" vectorizes text locally without any network access.
+    Vertex AI calls go through the process-wide rate limiter: document batches as bulk work, queries
+    at interactive priority.
     """
-    
-    def __init__(self, model_name, project, location):
-        self.client = VertexAIEmbeddings(
+
+    def __init__(self, model_name, project=None, location=None, cache_path=None, cache_size=100_000,
+                 backend="vertexai", rate_limiter=None, **backend_options):
+        self.backend = backend
+        self.rate_limiter = rate_limiter or (shared_rate_limiter if backend == "vertexai" else None)
+        # Vectors of different backends are not interchangeable, so they are cached under different keys
+        self.model_name = model_name if backend == "vertexai" else f"{backend}:{model_name}"
+        self.client = create_backend(
+            backend,
             model_name=model_name,
             project=project,
-            location=location
+            location=location,
+            **backend_options
         )
+        self.cache = EmbeddingCache(cache_path, max_entries=cache_size) if cache_path else None
 
     def embed_query(self, query):
         """
         Use the embbeding client to retrieve embeddings fot the given query
         """
-        vectors = self.client.embed_query(query)
+        if self.cache:
+            cached = self.cache.get_many(self.model_name, [query])[0]
+            if cached is not None:
+                metrics.increment("embedding_cache_hits")
+                return cached
+            metrics.increment("embedding_cache_misses")
+
+        with metrics.span("embedding_request"):
+            vectors = self._request(self.client.embed_query, query, estimate_tokens(query), INTERACTIVE)
+        metrics.increment("embedding_tokens", estimate_tokens(query))
+
+        if self.cache:
+            self.cache.put_many(self.model_name, [query], [vectors])
         return vectors
-    
+
     def embed_documents(self, documents):
         """
         Retrieve embedding for multiple documents.
+        Cached vectors are returned directly and only the misses are forwarded to the client in one batch.
         """
+        if not self.cache:
+            return self._embed_remote(documents)
+
+        vectors = self.cache.get_many(self.model_name, documents)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        metrics.increment("embedding_cache_hits", len(documents) - len(missing))
+        metrics.increment("embedding_cache_misses", len(missing))
+        if not missing:
+            return vectors
+
+        # Deduplicate the misses so repeated chunks are only embedded once
+        missing_texts = list(dict.fromkeys(documents[i] for i in missing))
+        embedded = self._embed_remote(missing_texts)
+        if embedded is None:
+            return None
+
+        self.cache.put_many(self.model_name, missing_texts, embedded)
+        by_text = dict(zip(missing_texts, embedded))
+        for i in missing:
+            vectors[i] = by_text[documents[i]]
+        return vectors
+
+    def _embed_remote(self, documents):
         try:
-            return self.client.embed_documents(documents)
+            tokens = sum(estimate_tokens(text) for text in documents)
+            with metrics.span("embedding_request"):
+                vectors = self._request(self.client.embed_documents, documents, tokens, BULK)
+            metrics.increment("embedded_texts", len(documents))
+            metrics.increment("embedding_tokens", tokens)
+            return vectors
         except AttributeError:
             print("Method embed_documents not defined for the client.")
-            return None
\ No newline at end of file
+            return None
+
+    def _request(self, fn, argument, tokens, priority):
+        """
+        Call the backend, scheduled by the rate limiter when there is one.
+        """
+        if self.rate_limiter is None:
+            return fn(argument)
+        return self.rate_limiter.call(fn, argument, tokens=tokens, priority=priority)
+
+    def cache_stats(self):
+        """
+        Return the hit/miss counters of the embedding cache, or None if caching is disabled.
+        """
+        return self.cache.stats() if self.cache else None
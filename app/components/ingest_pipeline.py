@@ -0,0 +1,135 @@
+import queue
+import threading
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _StageFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+class IngestPipeline:
+    """
+    A streaming ingestion pipeline: pages flow through splitting, embedding and upserting
+    as they are produced, instead of each phase materializing all of its output first.
+
+    The split and embed stages run on their own threads and hand work downstream through bounded
+    queues, so a slow stage applies backpressure to the stages before it and the number of chunks
+    in memory stays bounded regardless of document size. Upserting runs on the calling thread,
+    which is also where progress is reported (Streamlit elements can only be updated from there).
+    """
+
+    def __init__(self, split, embed, upsert, batch_size=64, queue_size=4, on_progress=None):
+        """
+        :param split: Callable taking an iterable of page Documents and lazily returning chunk Documents
+        :param embed: Callable taking a list of texts and returning their vectors
+        :param upsert: Callable taking a list of chunk Documents and their vectors and storing them
+        :param batch_size: Number of chunks embedded and upserted together, or a callable returning it
+                           (e.g., to follow the adaptive batch size of a BatchEmbedder)
+        :param queue_size: Maximum number of batches waiting between two stages
+        :param on_progress: Optional callable receiving the stats dict after every upserted batch
+        """
+        self.split = split
+        self.embed = embed
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self.stats = {"pages": 0, "chunks": 0, "batches": 0}
+
+    def run(self, pages) -> dict:
+        """
+        Push an iterable of page Documents through the pipeline and block until every chunk is stored.
+
+        :param pages: Iterable (typically a generator) of page Documents
+        :return: A dict with the number of pages, chunks and batches processed
+        """
+        self.stats = {"pages": 0, "chunks": 0, "batches": 0}
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        vector_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        workers = [
+            threading.Thread(target=self._split_stage, args=(pages, chunk_queue, stop), daemon=True),
+            threading.Thread(target=self._embed_stage, args=(chunk_queue, vector_queue, stop), daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                item = vector_queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageFailure):
+                    raise item.error
+
+                chunks, vectors = item
+                self.upsert(chunks, vectors)
+                self.stats["chunks"] += len(chunks)
+                self.stats["batches"] += 1
+                if self.on_progress:
+                    self.on_progress(dict(self.stats))
+        finally:
+            # Unblock the upstream stages if we stopped early
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        return dict(self.stats)
+
+    def _split_stage(self, pages, out_queue, stop):
+        try:
+            def counted(pages):
+                for page in pages:
+                    if stop.is_set():
+                        return
+                    self.stats["pages"] += 1
+                    yield page
+
+            batch = []
+            for chunk in self.split(counted(pages)):
+                batch.append(chunk)
+                if len(batch) >= self._batch_size():
+                    self._put(out_queue, batch, stop)
+                    batch = []
+            if stop.is_set():
+                return
+            if batch:
+                self._put(out_queue, batch, stop)
+            self._put(out_queue, _DONE, stop)
+        except Exception as error:
+            self._put(out_queue, _StageFailure(error), stop)
+
+    def _embed_stage(self, in_queue, out_queue, stop):
+        while not stop.is_set():
+            try:
+                item = in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE or isinstance(item, _StageFailure):
+                self._put(out_queue, item, stop)
+                return
+            try:
+                vectors = self.embed([chunk.page_content for chunk in item])
+            except Exception as error:
+                self._put(out_queue, _StageFailure(error), stop)
+                return
+            self._put(out_queue, (item, vectors), stop)
+
+    def _batch_size(self) -> int:
+        return max(1, self.batch_size() if callable(self.batch_size) else self.batch_size)
+
+    @staticmethod
+    def _put(out_queue, item, stop):
+        """
+        Block until the downstream queue has room, giving up if the pipeline was stopped.
+        """
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
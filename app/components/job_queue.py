@@ -0,0 +1,181 @@
+import asyncio
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class Job:
+    """
+    A quiz generation job and the questions it has produced so far.
+    """
+
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.questions = []
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.task = None
+        self._updated = asyncio.Event()
+
+    def notify(self):
+        """
+        Wake up everyone waiting for the next update of this job.
+        """
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "questions": self.questions,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """
+    An asyncio job queue running quiz generation jobs on a bounded number of workers.
+
+    Submitting a job with the same key as a queued, running or finished job returns the existing job
+    instead of generating again. Jobs can be cancelled while queued or running, and their questions
+    can be followed as they are produced.
+    """
+
+    def __init__(self, run_job, num_workers=2, max_finished_jobs=1000):
+        """
+        :param run_job: Callable taking a Job and returning an async iterator of generated questions
+        :param num_workers: Number of jobs run at once
+        :param max_finished_jobs: Number of finished jobs kept before the oldest are forgotten
+        """
+        self.run_job = run_job
+        self.num_workers = num_workers
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self._by_key = {}
+        self._queue = None
+        self._workers = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, key, params) -> Job:
+        """
+        Queue a job, or return the existing job with the same key unless it failed or was cancelled.
+        """
+        existing = self._by_key.get(key)
+        if existing is not None and existing.status not in (FAILED, CANCELLED):
+            return existing
+
+        job = Job(key, params)
+        self.jobs[job.id] = job
+        self._by_key[key] = job
+        self._queue.put_nowait(job)
+        self._forget_old_jobs()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id) -> bool:
+        """
+        Cancel a queued or running job. Returns False if the job is unknown or already finished.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+        self._finish(job, CANCELLED)
+        return True
+
+    async def updates(self, job):
+        """
+        Yield the questions of a job as they are produced, starting with those already available,
+        until the job finishes.
+        """
+        sent = 0
+        while True:
+            updated = job._updated
+            while sent < len(job.questions):
+                yield job.questions[sent]
+                sent += 1
+            if job.status in FINISHED:
+                return
+            await updated.wait()
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queue_depth": self._queue.qsize() if self._queue else 0, "jobs": counts}
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                # Cancelled while waiting in the queue
+                continue
+
+            job.status = RUNNING
+            job.notify()
+            job.task = asyncio.create_task(self._run(job))
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                if job.status not in FINISHED:
+                    # The worker itself is being stopped
+                    job.task.cancel()
+                    raise
+
+    async def _run(self, job):
+        try:
+            async for question in self.run_job(job):
+                job.questions.append(question)
+                job.notify()
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+            raise
+        except Exception as error:
+            job.error = str(error)
+            self._finish(job, FAILED)
+            return
+        self._finish(job, DONE)
+
+    def _finish(self, job, status):
+        if job.status in FINISHED:
+            return
+        job.status = status
+        job.finished = time.time()
+        job.notify()
+
+    def _forget_old_jobs(self):
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished
+        )
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    A small in-process registry of counters and timing spans for the ingestion and quiz pipeline.
+
+    Counters accumulate totals (tokens, retries, cache hits, ...). Gauges hold a current value (queue
+    depths, ...). Spans time a stage (PDF parsing, embedding, LLM calls, ...) and keep the count, sum and
+    maximum plus a window of recent samples for percentiles. Everything can be exported as Prometheus
+    text or JSON lines.
+    """
+
+    def __init__(self, prefix="quizify", window=1000):
+        """
+        :param prefix: Prefix of every exported metric name
+        :param window: Number of recent samples kept per span for percentiles
+        """
+        self.prefix = prefix
+        self.window = window
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        """
+        Add value to a counter.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """
+        Set a gauge to its current value.
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, seconds):
+        """
+        Record one duration sample for a span.
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = {"count": 0, "sum": 0.0, "max": 0.0, "samples": deque(maxlen=self.window)}
+                self._timings[name] = timing
+            timing["count"] += 1
+            timing["sum"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            timing["samples"].append(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Time the enclosed block and record it under name, also when the block raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Return the current counters, gauges and span summaries (count, sum, max, p50, p95) as a dict.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {}
+            for name, timing in self._timings.items():
+                samples = sorted(timing["samples"])
+                timings[name] = {
+                    "count": timing["count"],
+                    "sum": timing["sum"],
+                    "max": timing["max"],
+                    "p50": samples[int(0.50 * (len(samples) - 1))] if samples else 0.0,
+                    "p95": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+                }
+        return {"counters": counters, "gauges": gauges, "timings": timings}
+
+    def to_prometheus(self) -> str:
+        """
+        Export the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        for name, timing in sorted(snapshot["timings"].items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f'{metric}{{quantile="0.5"}} {timing["p50"]}')
+            lines.append(f'{metric}{{quantile="0.95"}} {timing["p95"]}')
+            lines.append(f"{metric}_sum {timing['sum']}")
+            lines.append(f"{metric}_count {timing['count']}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self) -> str:
+        """
+        Export the metrics as JSON lines, one object per counter or span, stamped with the current time.
+        """
+        snapshot = self.snapshot()
+        now = time.time()
+        records = [
+            {"time": now, "type": "counter", "name": name, "value": value}
+            for name, value in sorted(snapshot["counters"].items())
+        ]
+        records += [
+            {"time": now, "type": "gauge", "name": name, "value": value}
+            for name, value in sorted(snapshot["gauges"].items())
+        ]
+        records += [
+            {"time": now, "type": "span", "name": name, **timing}
+            for name, timing in sorted(snapshot["timings"].items())
+        ]
+        return "".join(json.dumps(record) + "\n" for record in records)
+
+    def write_json_lines(self, path):
+        """
+        Append the current metrics to a JSON lines file.
+        """
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_json_lines())
+
+
+def estimate_tokens(text) -> int:
+    """
+    Rough token count of a text (about four characters per token for English prose).
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+# Process-wide registry used by the components
+metrics = Metrics()
+
+
+def render_debug_panel():
+    """
+    Render the current metrics in a Streamlit sidebar expander, with Prometheus and JSON lines downloads.
+    """
+    import streamlit as st
+
+    with st.sidebar.expander("Pipeline metrics"):
+        snapshot = metrics.snapshot()
+        st.write("Timings (seconds)")
+        st.dataframe([{"span": name, **timing} for name, timing in sorted(snapshot["timings"].items())])
+        st.write("Counters")
+        st.json(snapshot["counters"])
+        st.write("Gauges")
+        st.json(snapshot["gauges"])
+        st.download_button("Prometheus", metrics.to_prometheus(), file_name="quizify.prom")
+        st.download_button("JSON lines", metrics.to_json_lines(), file_name="quizify-metrics.jsonl")
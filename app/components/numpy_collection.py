@@ -0,0 +1,153 @@
+import os
+from components.metrics import metrics
+from components.vector_collection import VectorCollectionCreator
+from components.vector_index import VectorIndex
+
+
+class NumpyCollectionCreator(VectorCollectionCreator):
+    """
+    Keeps the chunks in an in-process VectorIndex instead of a Chroma collection. Ingestion, querying
+    and as_retriever work the same as with ChromaCollectionCreator, but a small upload costs a single
+    quantized NumPy array instead of a Chroma client, and queries are one matrix product.
+
+    When a persist_directory is set the index is saved to persist_directory/collection_name after every
+    change and memory mapped from there when it is opened again. Other processes may save the same index
+    in the meantime, so an index changed on disk is loaded again, keeping the chunks this creator is
+    ingesting, before it is saved.
+    """
+
+    store_label = "Vector index"
+
+    def __init__(self, processor, embed_model, dtype="float16", mmap=True, **kwargs):
+        """
+        :param processor: An instance of DocumentProcessor that has processed documents.
+        :param embed_model: An embedding client for embedding documents
+        :param dtype: Storage type of the vectors, "float16" or "int8"
+        :param mmap: Whether a persisted index is memory mapped instead of read into memory
+        :param kwargs: Other VectorCollectionCreator arguments
+        """
+        super().__init__(processor, embed_model, **kwargs)
+        self.dtype = dtype
+        self.mmap = mmap
+        self.index = None
+        self._changed = False
+        # Modification time of the saved index when it was loaded or saved by this creator
+        self._version = None
+        # Documents whose chunks were upserted but not saved yet
+        self._pending_hashes = set()
+
+    @property
+    def index_path(self):
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, self.collection_name)
+
+    def _collection_exists(self) -> bool:
+        return bool(self.index_path) and os.path.exists(os.path.join(self.index_path, "entries.json"))
+
+    def _saved_version(self):
+        """
+        Return the modification time of the saved index, or None if there is none.
+        """
+        try:
+            return os.stat(os.path.join(self.index_path, "entries.json")).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def is_open(self) -> bool:
+        return self.index is not None
+
+    def _open_collection(self):
+        self.index = self._load_index()
+
+    def _load_index(self):
+        """
+        Load the saved index, or return an empty one if there is none (or it has a different dtype).
+        """
+        self._version = self._saved_version()
+        if self._collection_exists():
+            index = VectorIndex.load(self.index_path, mmap=self.mmap)
+            if index.dtype == self.dtype:
+                return index
+        return VectorIndex(dtype=self.dtype)
+
+    def _refresh(self):
+        if self._saved_version() == self._version:
+            return
+        # Another process saved the index, carry the chunks this creator didn't save yet over to its version
+        index = self._load_index()
+        rows = self.index.rows_where("doc_hash", self._pending_hashes)
+        if rows:
+            index.upsert(
+                ids=[self.index.ids[row] for row in rows],
+                vectors=[self.index.vector(row) for row in rows],
+                documents=[self.index.documents[row] for row in rows],
+                metadatas=[self.index.metadatas[row] for row in rows]
+            )
+        self.index = index
+
+    def _flush(self):
+        if self._changed and self.index_path:
+            with metrics.span("index_save"):
+                self.index.save(self.index_path)
+            self._version = self._saved_version()
+        self._changed = False
+        self._pending_hashes = set()
+
+    def _delete_document(self, doc_hash):
+        self._changed = True
+        self.index.delete(self.index.where("doc_hash", doc_hash))
+
+    def _upsert_chunks(self, chunks, vectors):
+        self._changed = True
+        self._pending_hashes.update(chunk.metadata["doc_hash"] for chunk in chunks)
+        with metrics.span("index_upsert"):
+            self.index.upsert(
+                ids=[chunk.metadata["chunk_id"] for chunk in chunks],
+                vectors=vectors,
+                documents=[chunk.page_content for chunk in chunks],
+                metadatas=[chunk.metadata for chunk in chunks]
+            )
+        metrics.increment("chunks_indexed", len(chunks))
+
+    def stored_document_hashes(self) -> set:
+        if self.index is None:
+            return set()
+        return {metadata["doc_hash"] for metadata in self.index.metadatas if "doc_hash" in metadata}
+
+    def chunk_count(self) -> int:
+        return len(self.index) if self.index is not None else 0
+
+    def similarity_search_with_relevance_scores(self, query, k=4) -> list:
+        # The relevance score is the cosine similarity
+        from langchain_core.documents import Document
+
+        query_vector = self.embed_model.embed_query(query)
+        with metrics.span("index_query"):
+            rows = self.index.search(query_vector, k=k, rows=self.index.rows_where("doc_hash", self.document_hashes))
+        return [
+            (Document(page_content=self.index.documents[row], metadata=self.index.metadatas[row]), score)
+            for row, score in rows
+        ]
+
+    def retrieve_with_vectors(self, query, k=20):
+        if self.index is None:
+            self._notify("error", f"{self.store_label} has not been created!", "🚨")
+            return None, []
+
+        from langchain_core.documents import Document
+
+        query_vector = self.embed_model.embed_query(query)
+        with metrics.span("index_query"):
+            rows = self.index.search(query_vector, k=k, rows=self.index.rows_where("doc_hash", self.document_hashes))
+        chunks = [
+            (Document(page_content=self.index.documents[row], metadata=self.index.metadatas[row]), self.index.vector(row))
+            for row, _ in rows
+        ]
+        return query_vector, chunks
+
+    def as_retriever(self, k=4):
+        from langchain_core.runnables import RunnableLambda
+        return RunnableLambda(
+            lambda query: [document for document, _ in self.similarity_search_with_relevance_scores(query, k=k)]
+        )
@@ -0,0 +1,176 @@
+import json
+import random
+import re
+import zlib
+
+# Largest prime below 2**32, the modulus of the MinHash permutations. Shingle hashes and permutation
+# coefficients stay below 2**32, so a * hash + b fits in an unsigned 64 bit integer.
+_PRIME = (1 << 32) - 5
+
+
+class QuestionIndex:
+    """
+    A MinHash/LSH index over quiz question text for cheap near-duplicate detection.
+
+    Each question is normalized, broken into character shingles and summarized by a MinHash signature.
+    Signatures are split into bands and bucketed, so a lookup only compares against the questions that
+    share at least one band instead of scanning the whole question pool. Candidates are accepted as
+    duplicates when their estimated Jaccard similarity reaches the configured threshold.
+
+    Signatures are computed with NumPy in one vectorized step and stored as packed 32 bit values. With
+    keep_texts=False the indexed texts themselves aren't kept, so an index over many large texts
+    (e.g., document chunks) only costs its signatures and buckets.
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, bands=16, shingle_size=4, seed=1, keep_texts=True):
+        """
+        :param threshold: Estimated Jaccard similarity at or above which two questions are duplicates
+        :param num_perm: Number of hash permutations in each MinHash signature
+        :param bands: Number of LSH bands, must divide num_perm
+        :param shingle_size: Number of characters per shingle
+        :param seed: Seed for the permutation coefficients, identical seeds give compatible indexes
+        :param keep_texts: Whether the indexed texts are kept, so find_duplicate can return them
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands.")
+
+        import numpy as np
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        rng = random.Random(seed)
+        permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._a = np.array([a for a, _ in permutations], dtype=np.uint64)[:, None]
+        self._b = np.array([b for _, b in permutations], dtype=np.uint64)[:, None]
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self.texts = [] if keep_texts else None
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = re.sub(r"[^\w\s]", " ", text.lower())
+        return " ".join(text.split())
+
+    def signature(self, text: str):
+        """
+        Compute the MinHash signature of a question text.
+
+        :return: A NumPy array of num_perm 32 bit values. Pass it to is_duplicate and add when the
+                 same text is checked and then indexed, so it is only computed once
+        """
+        import numpy as np
+
+        normalized = self.normalize(text)
+        if len(normalized) <= self.shingle_size:
+            shingles = {normalized}
+        else:
+            shingles = {
+                normalized[i:i + self.shingle_size]
+                for i in range(len(normalized) - self.shingle_size + 1)
+            }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        packed = signature.tobytes()
+        width = self.rows * signature.itemsize
+        for band in range(self.bands):
+            yield band, packed[band * width:(band + 1) * width]
+
+    def _find(self, signature):
+        """
+        Return the position of the stored signature most similar to signature if it reaches the threshold.
+        """
+        import numpy as np
+
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            other = np.frombuffer(self._signatures[candidate], dtype=np.uint32)
+            similarity = np.count_nonzero(signature == other) / self.num_perm
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+
+        if best is not None and best_similarity >= self.threshold:
+            return best
+        return None
+
+    def find_duplicate(self, text: str, signature=None):
+        """
+        Return the stored question most similar to text if it reaches the threshold, otherwise None.
+        Without keep_texts the position of the stored question is returned instead of its text.
+        """
+        position = self._find(self.signature(text) if signature is None else signature)
+        if position is None or self.texts is None:
+            return position
+        return self.texts[position]
+
+    def is_duplicate(self, text: str, signature=None) -> bool:
+        return self._find(self.signature(text) if signature is None else signature) is not None
+
+    def add(self, text: str, signature=None):
+        """
+        Add a question text to the index.
+
+        :param signature: The text's signature, if it was already computed
+        """
+        self._insert(text, self.signature(text) if signature is None else signature)
+
+    def _insert(self, text, signature):
+        position = len(self._signatures)
+        if self.texts is not None:
+            self.texts.append(text)
+        # Packed bytes take a fraction of the memory of a list of Python ints
+        self._signatures.append(signature.tobytes())
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def save(self, path):
+        """
+        Write the indexed questions and their signatures to a JSON file.
+        """
+        import numpy as np
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {
+                    "threshold": self.threshold,
+                    "num_perm": self.num_perm,
+                    "bands": self.bands,
+                    "shingle_size": self.shingle_size,
+                    "seed": self.seed,
+                    "keep_texts": self.texts is not None,
+                },
+                "texts": self.texts,
+                "signatures": [np.frombuffer(signature, dtype=np.uint32).tolist() for signature in self._signatures],
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index previously written with `save`.
+        """
+        import numpy as np
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(**data["config"])
+        texts = data["texts"] or [None] * len(data["signatures"])
+        for text, signature in zip(texts, data["signatures"]):
+            index._insert(text, np.array(signature, dtype=np.uint32))
+        return index
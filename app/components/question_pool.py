@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from components.question_index import QuestionIndex
+from components.metrics import metrics
+
+
+class QuestionPool:
+    """
+    A store of pre-generated quiz questions keyed by the uploaded document set and the quiz topic.
+
+    Quizzes are served by sampling from the pool, so repeated requests for the same material and topic
+    don't go through retrieval and the LLM again. When a pool runs low it is topped up by a background
+    thread, at bulk priority so it never holds up interactive requests. Questions expire after max_age seconds, each pool holds at most max_pool_size questions and
+    the least recently used pools are dropped once there are more than max_pools of them.
+    """
+
+    def __init__(self, path=":memory:", target_size=30, low_watermark=10, max_pool_size=100,
+                 max_pools=64, max_age=7 * 24 * 3600):
+        """
+        :param path: Path of the SQLite file backing the pool, in memory by default
+        :param target_size: Number of questions a background refill tops a pool up to
+        :param low_watermark: Pool size below which a background refill is started
+        :param max_pool_size: Maximum number of questions kept per pool
+        :param max_pools: Maximum number of pools kept before least recently used ones are evicted
+        :param max_age: Age in seconds after which a question is evicted
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.target_size = target_size
+        self.low_watermark = low_watermark
+        self.max_pool_size = max_pool_size
+        self.max_pools = max_pools
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refilling = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                pool_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS questions_pool_key ON questions (pool_key);
+            CREATE TABLE IF NOT EXISTS pools (
+                pool_key TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def pool_key(document_hashes, topic) -> str:
+        """
+        Build the pool key of a document set and topic. The key doesn't depend on upload order,
+        letter case or extra whitespace in the topic.
+        """
+        documents = hashlib.sha256("".join(sorted(set(document_hashes))).encode("utf-8")).hexdigest()
+        normalized_topic = " ".join((topic or "General Knowledge").lower().split())
+        return f"{documents}:{normalized_topic}"
+
+    def size(self, pool_key) -> int:
+        with self._lock:
+            self._expire()
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE pool_key = ?", (pool_key,)
+            ).fetchone()
+        return count
+
+    def questions(self, pool_key) -> list:
+        """
+        Return every question currently stored in a pool.
+        """
+        with self._lock:
+            self._expire()
+            rows = self._conn.execute(
+                "SELECT question FROM questions WHERE pool_key = ?", (pool_key,)
+            ).fetchall()
+        return [json.loads(question) for (question,) in rows]
+
+    def question_index(self, pool_key) -> QuestionIndex:
+        """
+        Return a duplicate index seeded with the questions of a pool. Pass it to a QuizGenerator whose
+        questions will be added to the pool, so they don't repeat the pool's questions.
+        """
+        question_index = QuestionIndex()
+        for question in self.questions(pool_key):
+            question_index.add(question["question"])
+        return question_index
+
+    def add(self, pool_key, questions, generator_factory=None):
+        """
+        Store questions in a pool, dropping its oldest questions beyond max_pool_size.
+
+        :param generator_factory: Optional callable as in get_quiz, used to top the pool up in the background
+                                  if it is still running low. Pass it when storing a quiz generated after a
+                                  miss, so the refill only starts once that quiz is in the pool
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO questions (pool_key, question, created) VALUES (?, ?, ?)",
+                [(pool_key, json.dumps(question), now) for question in questions]
+            )
+            self._conn.execute(
+                """
+                DELETE FROM questions WHERE pool_key = ? AND rowid NOT IN (
+                    SELECT rowid FROM questions WHERE pool_key = ? ORDER BY created DESC LIMIT ?
+                )
+                """,
+                (pool_key, pool_key, self.max_pool_size)
+            )
+            self._touch(pool_key, now)
+            self._conn.commit()
+        if generator_factory:
+            self._refill_if_low(pool_key, generator_factory, len(questions))
+
+    def sample(self, pool_key, num_questions):
+        """
+        Draw a random quiz from a pool.
+
+        :return: A list of num_questions questions, or None if the pool doesn't hold enough of them
+        """
+        questions = self.questions(pool_key)
+        if len(questions) < num_questions:
+            return None
+        with self._lock:
+            self._touch(pool_key, time.time())
+            self._conn.commit()
+        return random.sample(questions, num_questions)
+
+    def get_quiz(self, pool_key, num_questions, generator_factory=None):
+        """
+        Serve a quiz from the pool and start a background refill if the pool is running low.
+
+        On a miss no refill is started: the caller generates the quiz itself, with a QuizGenerator using
+        question_index(pool_key) so it doesn't repeat the questions the pool already holds, and stores
+        it with add(pool_key, quiz, generator_factory), which starts the refill once the quiz is in the
+        pool. Otherwise the refill would generate the same quiz a second time and miss its questions
+        when checking for duplicates.
+
+        :param pool_key: Key returned by pool_key
+        :param num_questions: Number of questions in the quiz
+        :param generator_factory: Optional callable taking (num_questions, question_index) and returning a
+                                  QuizGenerator, used to top the pool up in the background. It should
+                                  create generators with priority=BULK
+        :return: A list of questions, or None on a cache miss
+        """
+        quiz = self.sample(pool_key, num_questions)
+        metrics.increment("question_pool_hits" if quiz is not None else "question_pool_misses")
+        if quiz is not None and generator_factory:
+            self._refill_if_low(pool_key, generator_factory, num_questions)
+        return quiz
+
+    def _refill_if_low(self, pool_key, generator_factory, num_questions):
+        # Keep at least one more quiz of the requested size in the pool
+        if self.size(pool_key) < max(self.low_watermark, num_questions):
+            self.refill_async(pool_key, generator_factory)
+
+    def refill_async(self, pool_key, generator_factory):
+        """
+        Top a pool up to target_size on a background thread. Only one refill runs per pool at a time.
+        """
+        with self._lock:
+            if pool_key in self._refilling:
+                return
+            self._refilling.add(pool_key)
+
+        thread = threading.Thread(target=self._refill, args=(pool_key, generator_factory), daemon=True)
+        thread.start()
+        return thread
+
+    def _refill(self, pool_key, generator_factory):
+        try:
+            # Seed a duplicate index with the pool so refills only add new questions
+            question_index = self.question_index(pool_key)
+
+            while len(question_index) < self.target_size:
+                # QuizGenerator produces at most 10 questions per quiz
+                needed = min(10, self.target_size - len(question_index))
+                generator = generator_factory(needed, question_index)
+                questions = generator.generate_quiz()
+                if not questions:
+                    break
+                self.add(pool_key, questions)
+        except Exception as error:
+            print(f"Failed to refill question pool: {error}")
+        finally:
+            with self._lock:
+                self._refilling.discard(pool_key)
+
+    def _touch(self, pool_key, now):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pools (pool_key, last_access) VALUES (?, ?)", (pool_key, now)
+        )
+        stale = self._conn.execute(
+            "SELECT pool_key FROM pools ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_pools,)
+        ).fetchall()
+        for (key,) in stale:
+            self._conn.execute("DELETE FROM questions WHERE pool_key = ?", (key,))
+            self._conn.execute("DELETE FROM pools WHERE pool_key = ?", (key,))
+
+    def _expire(self):
+        self._conn.execute("DELETE FROM questions WHERE created < ?", (time.time() - self.max_age,))
+        self._conn.commit()
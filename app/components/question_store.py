@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class BankExpired(LookupError):
+    """
+    Raised when a QuestionBank is read after its bank was deleted from the store.
+    """
+
+
+class StoredQuestion:
+    """
+    A compact, read-only quiz question loaded from a QuestionStore.
+
+    Supports the same item access as the question dicts (question["choices"], ...), and keeps the
+    formatted choice labels so they aren't rebuilt on every Streamlit rerun.
+    """
+
+    __slots__ = ("question", "choices", "answer", "explanation", "choice_labels")
+
+    def __init__(self, question, choices, answer, explanation):
+        """
+        :param question: The question text
+        :param choices: Tuple of (key, value) pairs
+        :param answer: Key of the correct choice
+        :param explanation: Why the answer is correct
+        """
+        self.question = question
+        self.choices = choices
+        self.answer = answer
+        self.explanation = explanation
+        self.choice_labels = tuple(f"{key}) {value}" for key, value in choices)
+
+    def __getitem__(self, name):
+        if name == "choices":
+            return [{"key": key, "value": value} for key, value in self.choices]
+        if name in ("question", "answer", "explanation"):
+            return getattr(self, name)
+        raise KeyError(name)
+
+    def to_dict(self) -> dict:
+        return {
+            "question": self.question,
+            "choices": self["choices"],
+            "answer": self.answer,
+            "explanation": self.explanation,
+        }
+
+
+class QuestionBank:
+    """
+    A read-only sequence view of one question bank in a QuestionStore.
+
+    Only the page holding the last accessed question is kept in memory, so a bank of any size costs
+    a constant amount of memory per session. It can be used wherever a list of questions is expected.
+    """
+
+    def __init__(self, store, bank_id, length, page_size):
+        self.store = store
+        self.bank_id = bank_id
+        self.page_size = page_size
+        self._length = length
+        self._page_number = None
+        self._page = []
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index) -> StoredQuestion:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Question index out of range.")
+        page_number = index // self.page_size
+        if page_number != self._page_number:
+            self._page = self.store.page(self.bank_id, page_number, self.page_size)
+            # Every page of a live bank holds at least one question, so an empty page means it was deleted
+            if not self._page:
+                self._page_number = None
+                raise BankExpired(f"Question bank {self.bank_id} no longer exists.")
+            self._page_number = page_number
+        return self._page[index % self.page_size]
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def __repr__(self):
+        return f"QuestionBank(bank_id={self.bank_id!r}, questions={self._length})"
+
+
+class QuestionStore:
+    """
+    An SQLite file holding the question banks served to sessions, one compact row per question.
+
+    Sessions keep a QuestionBank view instead of the questions themselves and fetch questions a page
+    at a time by position. Banks not read for max_age seconds are deleted.
+    """
+
+    def __init__(self, path=":memory:", page_size=20, max_age=24 * 3600):
+        """
+        :param path: Path of the SQLite file backing the store, in memory by default
+        :param page_size: Number of questions fetched at once by a QuestionBank
+        :param max_age: Age in seconds after which an unused bank is deleted
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.page_size = page_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                bank_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                choices TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                PRIMARY KEY (bank_id, position)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS banks (
+                bank_id TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def create_bank(self, questions) -> QuestionBank:
+        """
+        Store a list of question dicts as a new bank.
+
+        :return: A QuestionBank view of the stored questions
+        """
+        bank_id = uuid.uuid4().hex
+        rows = [
+            (
+                bank_id,
+                position,
+                question["question"],
+                json.dumps([[choice["key"], choice["value"]] for choice in question["choices"]]),
+                question["answer"],
+                question.get("explanation", ""),
+            )
+            for position, question in enumerate(questions)
+        ]
+        with self._lock:
+            self._expire()
+            self._conn.executemany("INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT INTO banks VALUES (?, ?, ?)", (bank_id, len(rows), time.time()))
+            self._conn.commit()
+        return QuestionBank(self, bank_id, len(rows), self.page_size)
+
+    def bank(self, bank_id):
+        """
+        Return a QuestionBank view of a stored bank, or None if it doesn't exist (anymore).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM banks WHERE bank_id = ?", (bank_id,)).fetchone()
+        return QuestionBank(self, bank_id, row[0], self.page_size) if row else None
+
+    def page(self, bank_id, page_number, page_size=None) -> list:
+        """
+        Load one page of a bank.
+
+        :return: A list of up to page_size StoredQuestions, in bank order
+        """
+        page_size = page_size or self.page_size
+        start = page_number * page_size
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT question, choices, answer, explanation FROM questions
+                WHERE bank_id = ? AND position >= ? AND position < ? ORDER BY position
+                """,
+                (bank_id, start, start + page_size)
+            ).fetchall()
+            self._conn.execute("UPDATE banks SET last_access = ? WHERE bank_id = ?", (time.time(), bank_id))
+            self._conn.commit()
+        return [
+            StoredQuestion(question, tuple(tuple(choice) for choice in json.loads(choices)), answer, explanation)
+            for question, choices, answer, explanation in rows
+        ]
+
+    def delete(self, bank_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM questions WHERE bank_id = ?", (bank_id,))
+            self._conn.execute("DELETE FROM banks WHERE bank_id = ?", (bank_id,))
+            self._conn.commit()
+
+    def _expire(self):
+        """
+        Delete banks that weren't read for max_age seconds. Must be called with the lock held.
+        """
+        cutoff = time.time() - self.max_age
+        self._conn.execute(
+            "DELETE FROM questions WHERE bank_id IN (SELECT bank_id FROM banks WHERE last_access < ?)", (cutoff,)
+        )
+        self._conn.execute("DELETE FROM banks WHERE last_access < ?", (cutoff,))
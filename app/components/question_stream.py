@@ -0,0 +1,183 @@
+import json
+
+# Keys of a quiz question object
+QUESTION_KEYS = ("question", "choices", "answer", "explanation")
+
+
+class StreamAborted(ValueError):
+    """
+    Raised when a streamed LLM response can no longer become a valid question.
+    """
+
+
+def is_well_formed(question) -> bool:
+    """
+    Check a parsed question against the quiz question schema: a question, four choices,
+    an answer key present in the choices and an explanation.
+    """
+    if not isinstance(question, dict):
+        return False
+    if not isinstance(question.get("question"), str) or not question["question"].strip():
+        return False
+    choices = question.get("choices")
+    if not isinstance(choices, list) or len(choices) != 4:
+        return False
+    if not all(isinstance(choice, dict) and "key" in choice and "value" in choice for choice in choices):
+        return False
+    if question.get("answer") not in {choice["key"] for choice in choices}:
+        return False
+    return isinstance(question.get("explanation"), str)
+
+
+class QuestionStreamParser:
+    """
+    Incrementally parses a streamed LLM response holding one question object or a JSON array of them.
+
+    Text is fed chunk by chunk as it arrives. The parser tracks string and nesting state, so it can
+    check the keys of a question while it is being written and return every question as soon as its
+    closing brace arrives. A single question response is aborted (StreamAborted) as soon as it goes
+    wrong: no JSON at all, an unexpected key such as a misspelled "explanation", a rejected question
+    text, a schema violation or runaway length. In an array only the offending item is rejected.
+    """
+
+    def __init__(self, reject_question=None, prose_limit=200, max_item_chars=4000):
+        """
+        :param reject_question: Optional callable returning True for question texts that should be
+                                rejected (e.g., duplicates) as soon as the text is complete
+        :param prose_limit: Number of characters accepted before the first "{" or "["
+        :param max_item_chars: Maximum length of a single question object
+        """
+        self.reject_question = reject_question
+        self.prose_limit = prose_limit
+        self.max_item_chars = max_item_chars
+        self.text = ""
+        self.done = False
+        self.rejected = []
+
+        self._position = 0
+        self._root = None
+        self._depth = 0
+        self._item_depth = None
+        self._item_start = None
+        self._item_error = None
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._expect_key = False
+        self._last_key = None
+
+    @property
+    def truncated(self) -> bool:
+        """
+        Whether the response ended before its closing bracket.
+        """
+        return not self.done
+
+    def feed(self, chunk) -> list:
+        """
+        Consume the next chunk of the response.
+
+        :return: The questions completed by this chunk that match the schema
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._position < len(text) and not self.done:
+            index = self._position
+            char = text[index]
+            self._position += 1
+
+            if self._root is None:
+                if char in "{[":
+                    self._root = char
+                    self._item_depth = 1 if char == "{" else 2
+                    self._open(char, index)
+                elif index >= self.prose_limit:
+                    raise StreamAborted("Response doesn't contain JSON.")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(text[self._string_start + 1:index])
+            elif char == '"':
+                self._in_string = True
+                self._string_start = index
+                self._string_is_key = self._depth == self._item_depth and self._expect_key
+                self._expect_key = False
+            elif char in "{[":
+                self._open(char, index)
+            elif char in "}]":
+                if char == "}" and self._depth == self._item_depth:
+                    question = self._close_item(text[self._item_start:index + 1])
+                    if question is not None:
+                        completed.append(question)
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+            elif char == "," and self._depth == self._item_depth:
+                self._expect_key = True
+
+            if self._item_start is not None and index - self._item_start > self.max_item_chars:
+                # A runaway answer won't recover, so stop the whole response
+                raise StreamAborted("Question is longer than expected.")
+        return completed
+
+    def close(self):
+        """
+        Mark the end of the stream, aborting if a single question response is incomplete.
+        """
+        if self._root is None:
+            raise StreamAborted("Response doesn't contain JSON.")
+        if self._root == "{" and not self.done:
+            raise StreamAborted("Response ended before the question was complete.")
+
+    def _open(self, char, index):
+        self._depth += 1
+        if char == "{" and self._depth == self._item_depth:
+            self._item_start = index
+            self._item_error = None
+            self._expect_key = True
+            self._last_key = None
+
+    def _close_string(self, value):
+        if self._item_start is None or self._depth != self._item_depth:
+            return
+        if self._string_is_key:
+            self._last_key = value
+            if value not in QUESTION_KEYS:
+                self._fail(f"Unexpected key '{value}'.")
+        elif self._last_key == "question" and self.reject_question and self.reject_question(value):
+            self._fail("Question was rejected.")
+
+    def _close_item(self, item_text):
+        error = self._item_error
+        question = None
+        if error is None:
+            try:
+                question = json.loads(item_text)
+            except json.JSONDecodeError:
+                error = "Question is not valid JSON."
+        if error is None and not is_well_formed(question):
+            error = "Question doesn't match the schema."
+        self._item_start = None
+
+        if error is not None:
+            self._fail(error)
+            self.rejected.append(error)
+            return None
+        return question
+
+    def _fail(self, reason):
+        """
+        Abort a single question response, or mark the current item of an array as rejected.
+        """
+        if self._root == "{":
+            raise StreamAborted(reason)
+        if self._item_error is None:
+            self._item_error = reason
@@ -1,13 +1,22 @@
+import asyncio
 import streamlit as st
-from langchain_google_vertexai import VertexAI
-from langchain_core.prompts import PromptTemplate
-import langchain_core.output_parsers.json as json
 import os
+import time
 import sys
 sys.path.append(os.path.abspath('../'))
+from components.question_index import QuestionIndex
+from components.context_sampler import ContextSampler
+from components.context_packer import ContextPacker
+from components.resources import get_llm
+from components.metrics import metrics, estimate_tokens
+from components.question_stream import QuestionStreamParser, StreamAborted, is_well_formed
+from components.rate_limiter import rate_limiter as shared_rate_limiter, INTERACTIVE
+
 
 class QuizGenerator:
-    def __init__(self, topic=None, num_questions=1, vectorstore=None):
+    def __init__(self, topic=None, num_questions=1, vectorstore=None, max_concurrency=4, batch_size=1,
+                 question_index=None, similarity_threshold=0.7, context_size=4, fetch_k=20, rate_limiter=None,
+                 context_budget=768, priority=INTERACTIVE):
         """
         Initializes the QuizGenerator with a required topic, the number of questions for the quiz,
         and an optional vectorstore for querying related information.
@@ -15,6 +24,16 @@ class QuizGenerator:
         :param topic: A string representing the required topic for the quiz
         :param num_questions: An integer representing the number of questions to generate for the quiz, up to a maximum of 10/
         :param vectorstore: An optional vectorstore instance (e.g., ChromaDB) to be used for querying information related to the quiz topic.
+        :param max_concurrency: Maximum number of questions generated at once by the async methods
+        :param batch_size: Maximum number of questions requested from the LLM in a single call by `generate_quiz_batched`
+        :param question_index: An optional shared QuestionIndex holding a stored question pool; new questions that
+                               are near-duplicates of the pool are rejected and accepted questions are added to it
+        :param similarity_threshold: Similarity at or above which a question counts as a duplicate within the quiz
+        :param context_size: Number of retrieved chunks given to each question as context
+        :param fetch_k: Number of chunks retrieved once per quiz and sampled from for every question
+        :param rate_limiter: RateLimiter scheduling the LLM calls, defaults to the process-wide one
+        :param context_budget: Maximum number of context tokens per question in the prompt
+        :param priority: Priority class of the LLM calls in the rate limiter, BULK for background work
         """
         if not topic:
             self.topic = "General Knowledge"
@@ -24,11 +43,27 @@ class QuizGenerator:
         if num_questions > 10:
             raise ValueError("Number of questions cannot exceed 10.")
         self.num_questions = num_questions
+        self.max_concurrency = max_concurrency
+        self.batch_size = max(1, batch_size)
+        self.question_index = question_index
+        self.similarity_threshold = similarity_threshold
+        self.context_size = context_size
+        self.fetch_k = fetch_k
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.priority = priority
+        self.context_packer = ContextPacker(token_budget=context_budget)
+        self.prompt_tokens = 0
+        self.question_bank = []
+        self._quiz_index = QuestionIndex(threshold=similarity_threshold)
+        self._context_sampler = None
+        self._chains = {}
 
         self.vectorstore = vectorstore
         self.llm = None
+        # The instructions come first and the topic and context last, so every prompt starts with the
+        # same prefix and provider-side prompt caching can apply
         self.system_template = """
-            You are a subject matter expert on the topic: {topic}
+            You are a subject matter expert writing quiz questions about the topic and context below.
             
             Follow the instructions to create a quiz question:
             1. Generate a question based on the topic provided and context as key "question"
@@ -49,62 +84,226 @@ class QuizGenerator:
                 "explanation": "<explanation as to why the answer is correct>"
             }}
             
+            Topic: {topic}
+            
+            Context: {context}
+            """
+        self.batch_template = """
+            You are a subject matter expert writing quiz questions about the topic and context below.
+            
+            Follow the instructions to create {num_questions} different quiz questions:
+            1. Generate each question based on the topic provided and context as key "question"
+            2. Provide 4 multiple choice answers to each question as a list of key-value pairs "choices"
+            3. Provide the correct answer for each question from the list of answers as key "answer"
+            4. Provide an explanation as to why the answer is correct as key "explanation"
+            
+            You must respond as a JSON array of {num_questions} objects with the following structure:
+            [
+                {{
+                    "question": "<question>",
+                    "choices": [
+                        {{"key": "A", "value": "<choice>"}},
+                        {{"key": "B", "value": "<choice>"}},
+                        {{"key": "C", "value": "<choice>"}},
+                        {{"key": "D", "value": "<choice>"}}
+                    ],
+                    "answer": "<answer key from choices list>",
+                    "explanation": "<explanation as to why the answer is correct>"
+                }}
+            ]
+            
+            Topic: {topic}
+            
             Context: {context}
             """
         
     def init_llm(self):
         """
         Initialize the Large Language Model for quiz question generator/
+        The client is shared process-wide, so generators with the same settings reuse one client.
         """
-        self.llm = VertexAI(
+        self.llm = get_llm(
             model_name="gemini-pro",
             temperature=0.5,
-            max_output_tokens=500
+            # Leave room for a whole batch of questions when batch prompting is enabled
+            max_output_tokens=500 * self.batch_size
         )
 
-    def generate_question_with_vectorstore(self):
+    def _count_prompt_tokens(self, chain, inputs) -> int:
+        tokens = estimate_tokens(chain.first.format(**inputs))
+        self.prompt_tokens += tokens
+        metrics.increment("llm_calls")
+        metrics.increment("llm_prompt_tokens", tokens)
+        return tokens
+
+    def prompt_tokens_per_question(self) -> float:
         """
-        This method leverages the vectorstore to retrieve relevant context for the quiz topic, then utilizes the LLM to generate a structured quiz question in JSON format.
-        The process involves retrieving documents, creating a prompt, and invoking the LLM to generate a question.
-        
-        Implementation:
-        - Utitlize 'RunnableParallel' and 'RunnablePassthrough' to create a chain that integrates documents retrieva; and topic processing.
-        - Format the system template with the topic and retrieved contexr to create a comprehensive prompt for the LLM.
-        - Use the LLM to generate a quiz question based on the prompt and return the structured response.
+        Return the prompt tokens spent on the current quiz per accepted question, including rejected calls.
         """
+        return self.prompt_tokens / len(self.question_bank) if self.question_bank else 0.0
 
-        # Initilize the LLM from the 'init_llm' method if not already initizied
-        if not self.llm:
-            self.init_llm()
+    def _count_output_tokens(self, text):
+        tokens = estimate_tokens(text)
+        metrics.increment("llm_output_tokens", tokens)
+        self.rate_limiter.charge(tokens)
+
+    def stream_question(self) -> dict:
+        """
+        Generate a single question with a streamed LLM call that is validated while it is written.
+        The call is cancelled as soon as the response can no longer become a valid, unique question.
+
+        :raises StreamAborted: If the response was aborted or ended without a valid question
+        """
+        parser = QuestionStreamParser(reject_question=self.is_duplicate)
+        inputs = {"topic": self.topic, "context": self.next_context()}
+        for question in self._stream(self._get_chain(), inputs, parser):
+            return question
+        raise StreamAborted(parser.rejected[0] if parser.rejected else "Response didn't contain a question.")
+
+    async def astream_question(self) -> dict:
+        """
+        Async counterpart of stream_question.
+        """
+        parser = QuestionStreamParser(reject_question=self.is_duplicate)
+        inputs = {"topic": self.topic, "context": self.next_context()}
+        questions = self._astream(self._get_chain(), inputs, parser)
+        try:
+            async for question in questions:
+                return question
+        finally:
+            # Async generators aren't closed when they go out of scope, so cancel the LLM stream here
+            await questions.aclose()
+        raise StreamAborted(parser.rejected[0] if parser.rejected else "Response didn't contain a question.")
+
+    def stream_questions_batch(self, num_questions, parser):
+        """
+        Ask the LLM for several questions in one streamed call and yield each one as soon as it is complete.
+
+        :param num_questions: Number of questions to request
+        :param parser: The QuestionStreamParser consuming the response; it tells whether the array was truncated
+        """
+        chain = self._get_chain(self.batch_template, num_questions=num_questions)
+        context = self.next_context(self.context_size * num_questions)
+        yield from self._stream(chain, {"topic": self.topic, "context": context}, parser)
+
+    def _stream(self, chain, inputs, parser):
+        """
+        Stream a prompt + LLM chain through a parser, yielding questions as they complete. Stops reading
+        as soon as the JSON is complete, and closes the stream when the parser aborts or the caller stops.
+        """
+        prompt_tokens = self._count_prompt_tokens(chain, inputs)
+        started = time.perf_counter()
+        first = True
+        stream = self.rate_limiter.stream(lambda: chain.stream(inputs), tokens=prompt_tokens, priority=self.priority)
+        try:
+            with metrics.span("llm_call"):
+                for chunk in stream:
+                    self._count_output_tokens(chunk)
+                    for question in parser.feed(chunk):
+                        if first:
+                            metrics.observe("llm_first_question", time.perf_counter() - started)
+                            first = False
+                        yield question
+                    if parser.done:
+                        break
+                parser.close()
+        except StreamAborted:
+            metrics.increment("llm_stream_aborts")
+            raise
+        finally:
+            stream.close()
+
+    async def _astream(self, chain, inputs, parser):
+        """
+        Async counterpart of _stream.
+        """
+        prompt_tokens = self._count_prompt_tokens(chain, inputs)
+        started = time.perf_counter()
+        first = True
+        stream = self.rate_limiter.astream(lambda: chain.astream(inputs), tokens=prompt_tokens, priority=self.priority)
+        try:
+            with metrics.span("llm_call"):
+                async for chunk in stream:
+                    self._count_output_tokens(chunk)
+                    for question in parser.feed(chunk):
+                        if first:
+                            metrics.observe("llm_first_question", time.perf_counter() - started)
+                            first = False
+                        yield question
+                    if parser.done:
+                        break
+                parser.close()
+        except StreamAborted:
+            metrics.increment("llm_stream_aborts")
+            raise
+        finally:
+            await stream.aclose()
+
+    def retrieve_context(self):
+        """
+        Run the topic similarity search once for the quiz and cache the top fetch_k chunks.
+        """
         if not self.vectorstore:
             raise ValueError('Vectorstore not provided.')
 
-        from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+        metrics.increment("retrievals")
+        with metrics.span("retrieval"):
+            if hasattr(self.vectorstore, "retrieve_with_vectors"):
+                query_vector, chunks = self.vectorstore.retrieve_with_vectors(self.topic, k=self.fetch_k)
+            else:
+                # Plain LangChain vectorstores: let the store run MMR and sample from its results in order
+                documents = self.vectorstore.max_marginal_relevance_search(self.topic, k=self.fetch_k)
+                query_vector, chunks = [1.0], [(document, [1.0]) for document in documents]
+        self._context_sampler = ContextSampler(query_vector, chunks)
 
-        # Enable a Retriever using as_retriever() method on the VectorStore object
-        retriever = self.vectorstore.as_retriever()
+    def next_context(self, k=None) -> str:
+        """
+        Return the context for the next question: chunks sampled from the cached retrieval results,
+        packed without overlapping text into the context token budget.
 
-        # Use the system template to create a PromptTemplate
-        prompt = PromptTemplate.from_template(self.system_template)
+        :param k: Number of chunks to sample, defaults to context_size. The budget scales with k, so a
+                  batch of questions gets the budget of that many single questions
+        """
+        if self._context_sampler is None:
+            self.retrieve_context()
+        k = k or self.context_size
+        scored_documents = self._context_sampler.sample_scored(k)
+        with metrics.span("context_packing"):
+            return self.context_packer.pack(
+                scored_documents,
+                token_budget=self.context_packer.token_budget * k // self.context_size
+            )
 
-        # RunnableParallel allow Retriver to get relevant documents
-        # RunnablePassThrough allows chain.invoke to send self.topic to LLM
-        setup_and_retrieval = RunnableParallel(
-            {"context": lambda x: retriever, "topic": RunnablePassthrough()}
-        )
+    def _get_chain(self, template=None, **partials):
+        """
+        Return the prompt + LLM chain for a template, building it only once per generator.
+
+        :param template: Prompt template to use, defaults to the single question system_template
+        :param partials: Extra template variables filled in ahead of time (e.g., num_questions)
+        """
+
+        # Initilize the LLM from the 'init_llm' method if not already initizied
+        if not self.llm:
+            self.init_llm()
+
+        key = (template or self.system_template, tuple(sorted(partials.items())))
+        if key not in self._chains:
+            from langchain_core.prompts import PromptTemplate
 
-        # Create a chain with the Retriever, PromptTemplate, and LLM
-        chain = setup_and_retrieval | prompt | self.llm
+            # Use the system template to create a PromptTemplate
+            prompt = PromptTemplate.from_template(template or self.system_template)
+            if partials:
+                prompt = prompt.partial(**partials)
 
-        # Invoke the chain with the topic as input
-        response = chain.invoke(self.topic)
-        return response
+            # Create a chain with the PromptTemplate and LLM
+            self._chains[key] = prompt | self.llm
+        return self._chains[key]
 
     def generate_quiz(self) -> list:
         """
         Generate a list of unique quiz question based on the specified topic and number of question.
         
-        This method orchestrates the quiz generation process by utilizing the `generate_question_with_vectorstore` method to generate
+        This method orchestrates the quiz generation process by utilizing the `stream_question` method to generate
         each question and the `validate_question` method to ensure its uniqueness before adding it to the quiz.
 
         Returns:
@@ -112,7 +311,7 @@ class QuizGenerator:
         """
 
         # Reset question bank
-        self.question_bank = []
+        self.reset_question_bank()
 
         retry_limit = 3
         retry_count = 0
@@ -120,40 +319,210 @@ class QuizGenerator:
         for _ in range(self.num_questions):
             if retry_count >= retry_limit:
                 break
-            while True:
-                # Generate question
-                question_str = self.generate_question_with_vectorstore()
-
+            while retry_count < retry_limit:
+                # Generate question, validated while it is streamed
                 try:
-                    question = json.parse_json_markdown(question_str)
-                except json.JSONDecodeError:
-                    print("Failed to decode question JSON.")
+                    question = self.stream_question()
+                except StreamAborted as error:
+                    print(f"Question generation aborted: {error}")
                     retry_count += 1
-                    continue # Skip this iteration if JSON decoding fails
+                    metrics.increment("question_retries")
+                    continue # Skip this iteration if the response went wrong
 
                 # Validate question using the validate_question method
                 if self.validate_question(question):
                     print("Successfully generated unique question.")
                     # Add the valid question into question bank
-                    self.question_bank.append(question)
+                    self.add_question(question)
                     retry_count = 0
                     break
                 else:
                     print("Duplicate or invalid question detected")
                     retry_count += 1
+                    metrics.increment("question_retries")
         
         return self.question_bank
             
+    async def astream_quiz(self):
+        """
+        Generate the quiz concurrently, yielding each unique question as soon as it is ready.
+
+        Up to max_concurrency streamed generations run at once. Questions are validated with `validate_question`
+        and the same retry budget as `generate_quiz` applies: generation stops after `retry_limit`
+        consecutive invalid, aborted or duplicate questions.
+        """
+
+        # Reset question bank
+        self.reset_question_bank()
+
+        # Retrieval embeds the topic with a blocking, rate limited call, so run it off the event loop
+        await asyncio.to_thread(self.retrieve_context)
+
+        retry_limit = 3
+        retry_count = 0
+        pending = set()
+
+        try:
+            while len(self.question_bank) < self.num_questions and retry_count < retry_limit:
+                # Keep up to max_concurrency generations in flight, never more than still needed
+                while (len(pending) < self.max_concurrency
+                       and len(pending) + len(self.question_bank) < self.num_questions):
+                    pending.add(asyncio.ensure_future(self.astream_question()))
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        question = task.result()
+                    except StreamAborted as error:
+                        print(f"Question generation aborted: {error}")
+                        retry_count += 1
+                        metrics.increment("question_retries")
+                        continue
+
+                    if len(self.question_bank) >= self.num_questions:
+                        continue
+
+                    if self.validate_question(question):
+                        print("Successfully generated unique question.")
+                        self.add_question(question)
+                        retry_count = 0
+                        yield question
+                    else:
+                        print("Duplicate or invalid question detected")
+                        retry_count += 1
+                        metrics.increment("question_retries")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def agenerate_quiz(self) -> list:
+        """
+        Async counterpart of `generate_quiz` that generates up to max_concurrency questions at once.
+        """
+        async for _ in self.astream_quiz():
+            pass
+        return self.question_bank
+
+    def generate_quiz_batched(self) -> list:
+        """
+        Generate the quiz with batch prompting: one streamed LLM call returns up to `batch_size` questions
+        as a JSON array, and every item is parsed and validated on its own as soon as it is complete.
+        Only the items that were invalid or duplicated are requested again. If the response was truncated
+        (e.g., by max_output_tokens), the complete items are kept and the rest of the quiz falls back to
+        single question calls.
+        """
+
+        # Reset question bank
+        self.reset_question_bank()
+
+        retry_limit = 3
+        retry_count = 0
+
+        while len(self.question_bank) < self.num_questions and retry_count < retry_limit:
+            remaining = self.num_questions - len(self.question_bank)
+            parser = QuestionStreamParser(reject_question=self.is_duplicate)
+
+            accepted = 0
+            received = 0
+            try:
+                for question in self.stream_questions_batch(min(remaining, self.batch_size), parser):
+                    received += 1
+                    if len(self.question_bank) >= self.num_questions:
+                        break
+                    if self.validate_question(question):
+                        self.add_question(question)
+                        accepted += 1
+                    else:
+                        print("Duplicate or invalid question detected")
+            except StreamAborted as error:
+                print(f"Batch generation aborted: {error}")
+
+            print(f"Accepted {accepted} of {received + len(parser.rejected)} questions from batch.")
+            retry_count = 0 if accepted else retry_count + 1
+
+            if parser.truncated:
+                print("Batch response was truncated, falling back to single question generation.")
+                break
+
+        # Fill whatever is still missing one question at a time
+        if len(self.question_bank) < self.num_questions and retry_count < retry_limit:
+            self._fill_with_single_questions(retry_limit - retry_count)
+
+        return self.question_bank
+
+    def _fill_with_single_questions(self, retry_limit):
+        retry_count = 0
+        while len(self.question_bank) < self.num_questions and retry_count < retry_limit:
+            try:
+                question = self.stream_question()
+            except StreamAborted as error:
+                print(f"Question generation aborted: {error}")
+                retry_count += 1
+                metrics.increment("question_retries")
+                continue
+
+            if self.validate_question(question):
+                self.add_question(question)
+                retry_count = 0
+            else:
+                print("Duplicate or invalid question detected")
+                retry_count += 1
+                metrics.increment("question_retries")
+
+    def reset_question_bank(self):
+        """
+        Clear the generated quiz and its near-duplicate index.
+        """
+        self.question_bank = []
+        self.prompt_tokens = 0
+        self._quiz_index = QuestionIndex(threshold=self.similarity_threshold)
+        self._context_sampler = None
+
+    def add_question(self, question: dict):
+        """
+        Add a validated question to the quiz and to the duplicate indexes.
+        """
+        self.question_bank.append(question)
+        metrics.increment("questions_generated")
+        metrics.set_gauge("llm_prompt_tokens_per_question", self.prompt_tokens_per_question())
+        self._quiz_index.add(question['question'])
+        if self.question_index is not None:
+            self.question_index.add(question['question'])
+
     def validate_question(self, question: dict) -> bool:
         """
-        Validate a quiz question for uniqueness within generated quiz
+        Validate a quiz question for uniqueness within generated quiz, and check that it has a question,
+        four choices, an answer key present in the choices and an explanation.
+
+        Uniqueness is checked with MinHash/LSH indexes, so paraphrased duplicates are rejected as well
+        and the cost of a check doesn't grow linearly with the number of stored questions.
+        """
+
+        if not self.is_well_formed(question):
+            metrics.increment("invalid_questions")
+            return False
+
+        return not self.is_duplicate(question['question'])
+
+    def is_duplicate(self, question_text: str) -> bool:
         """
+        Check a question text against the questions of this quiz and the shared question index.
+        Streamed generations call this as soon as the question text is complete.
+        """
+        if self._quiz_index.is_duplicate(question_text):
+            metrics.increment("duplicate_rejections")
+            return True
+        if self.question_index is not None and self.question_index.is_duplicate(question_text):
+            metrics.increment("duplicate_rejections")
+            return True
+        return False
 
-        new_question_text = question['question']
-        for q in self.question_bank:
-            if q['question'] == new_question_text:
-                return False
-        return True
+    @staticmethod
+    def is_well_formed(question) -> bool:
+        """
+        Check a parsed question against the quiz question schema.
+        """
+        return is_well_formed(question)
 
                     
 
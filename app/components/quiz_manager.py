@@ -5,9 +5,10 @@ import sys
 sys.path.append(os.path.abspath('../'))
 
 class QuizManager:
-    def __init__(self, questions: list):
+    def __init__(self, questions):
         """
-        Initilize the QuizManager class with a list of quiz question
+        Initilize the QuizManager class with a list of quiz question, or a QuestionBank view of a stored
+        question bank. A QuestionBank only loads the page holding the question being shown.
         """
         self.questions = questions
         self.total_questions = len(questions)
@@ -22,7 +23,7 @@ class QuizManager:
 
     def next_question_index(self, direction=1):
         """
-        Adjust the current quiz question index based on the specified direction
+        Adjust the current quiz question index based on the specified direction and return that question
         """
 
         next_index = (st.session_state["question_index"] + direction) % self.total_questions
@@ -0,0 +1,332 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from components.metrics import metrics
+
+# Priority classes, lower values are served first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Marks a stream that ended before its first chunk
+_EMPTY = object()
+
+
+def is_quota_error(error) -> bool:
+    """
+    Return True if an exception raised by the provider signals rate limiting or exhausted quota.
+    """
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "quota", "resourceexhausted", "rate limit", "too many requests"))
+
+
+class RateLimiter:
+    """
+    A process-wide scheduler for the calls made to a rate limited provider such as Vertex AI.
+
+    Two token buckets cap the requests and the tokens per minute. Each refills continuously and holds
+    at most one minute's worth. Callers wait in one queue ordered by priority class, then arrival, and
+    only the head of the queue may take from the buckets, so interactive question generation is never
+    stuck behind bulk embedding batches that were queued earlier. When the provider still answers with
+    a quota error, all callers pause for a jittered, exponentially growing delay before the call is
+    retried, instead of every caller retrying at once.
+    """
+
+    def __init__(self, requests_per_minute=300, tokens_per_minute=None, max_retries=5, backoff=1.0,
+                 max_backoff=60.0):
+        """
+        :param requests_per_minute: Maximum number of calls started per minute
+        :param tokens_per_minute: Optional maximum number of tokens per minute (prompt and output)
+        :param max_retries: Number of times a call is retried after a quota error
+        :param backoff: Base pause in seconds after a quota error, doubled on every consecutive retry
+        :param max_backoff: Upper bound of the pause in seconds
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue = []
+        self._waiters = {}  # ticket -> future of an aacquire call waiting to reach the head of the queue
+        self._sequence = itertools.count()
+        self._depths = {priority: 0 for priority in PRIORITY_NAMES}
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute,
+                             self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self._set_depth(priority, 1)
+        return ticket
+
+    def _discard(self, ticket):
+        """
+        Remove a ticket whose caller stopped waiting (e.g., a cancelled task).
+        """
+        with self._condition:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._set_depth(ticket[0], -1)
+                self._notify_waiters()
+
+    def _set_depth(self, priority, change):
+        self._depths[priority] += change
+        metrics.set_gauge(f"rate_limit_queue_depth_{PRIORITY_NAMES[priority]}", self._depths[priority])
+
+    def _try_take(self, ticket, tokens):
+        """
+        Take one request and the tokens from the buckets if the ticket is at the head of the queue.
+        Must be called with the condition held.
+
+        :return: None if the call may start, otherwise the number of seconds to wait before trying again
+        """
+        if self._queue[0] != ticket:
+            return 1.0
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._refill(now)
+        # A call larger than the bucket would never fit, so it only waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        waits = []
+        if self._requests < 1:
+            waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+        if tokens and self._tokens < tokens:
+            waits.append((tokens - self._tokens) * 60 / self.tokens_per_minute)
+        if waits:
+            return max(waits)
+
+        self._requests -= 1
+        self._tokens -= tokens
+        heapq.heappop(self._queue)
+        self._set_depth(ticket[0], -1)
+        self._notify_waiters()
+        return None
+
+    def _notify_waiters(self):
+        """
+        Wake the threads blocked in acquire and the aacquire call now at the head of the queue, if any.
+        Must be called with the condition held.
+        """
+        self._condition.notify_all()
+        if self._queue:
+            future = self._waiters.pop(self._queue[0], None)
+            if future is not None:
+                future.get_loop().call_soon_threadsafe(_wake, future)
+
+    def _record_wait(self, priority, started):
+        metrics.observe(f"rate_limit_wait_{PRIORITY_NAMES[priority]}", time.perf_counter() - started)
+
+    def acquire(self, tokens=0, priority=BULK):
+        """
+        Block until a call using about tokens tokens may start.
+
+        :raises RuntimeError: If called from a thread running an event loop. Blocking there would stop
+                              the loop's own queued aacquire calls from ever reaching the head of the
+                              queue, so async code must use aacquire or move the call to a thread
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("RateLimiter.acquire would block the running event loop, use aacquire instead.")
+
+        started = time.perf_counter()
+        ticket = self._enqueue(priority)
+        try:
+            with self._condition:
+                while True:
+                    delay = self._try_take(ticket, tokens)
+                    if delay is None:
+                        break
+                    self._condition.wait(min(delay, 1.0))
+        except BaseException:
+            self._discard(ticket)
+            raise
+        self._record_wait(priority, started)
+
+    async def aacquire(self, tokens=0, priority=BULK):
+        """
+        Async counterpart of acquire that waits without blocking the event loop.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                woken = None
+                with self._condition:
+                    delay = self._try_take(ticket, tokens)
+                    if delay is None:
+                        break
+                    if self._queue[0] != ticket:
+                        # Wait until the calls ahead are served instead of polling
+                        woken = self._waiters[ticket] = loop.create_future()
+                if woken is None:
+                    # At the head of the queue, sleep until the buckets have refilled
+                    await asyncio.sleep(delay)
+                else:
+                    await woken
+        except BaseException:
+            with self._condition:
+                self._waiters.pop(ticket, None)
+            self._discard(ticket)
+            raise
+        self._record_wait(priority, started)
+
+    def charge(self, tokens):
+        """
+        Take tokens that were only known after a call (e.g., its output) from the token bucket.
+        The bucket may go negative, which delays the next calls accordingly.
+        """
+        if not self.tokens_per_minute or not tokens:
+            return
+        with self._condition:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+
+    def report_quota_error(self, attempt):
+        """
+        Pause all calls for a jittered, exponentially growing delay after the provider reported a quota error.
+
+        :param attempt: Number of retries of the failed call so far
+        :return: The pause in seconds
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        metrics.increment("rate_limit_quota_errors")
+        return delay
+
+    def _should_retry(self, error, attempt) -> bool:
+        if not is_quota_error(error) or attempt >= self.max_retries:
+            return False
+        delay = self.report_quota_error(attempt)
+        print(f"Quota error, pausing calls for {delay:.1f}s before retry {attempt + 1}.")
+        metrics.increment("rate_limit_retries")
+        return True
+
+    def call(self, fn, *args, tokens=0, priority=BULK, **kwargs):
+        """
+        Call fn(*args, **kwargs) once the buckets allow it, retrying it after quota errors.
+        """
+        for attempt in itertools.count():
+            self.acquire(tokens, priority)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as error:
+                if not self._should_retry(error, attempt):
+                    raise
+
+    async def acall(self, fn, *args, tokens=0, priority=BULK, **kwargs):
+        """
+        Async counterpart of call for a coroutine function fn.
+        """
+        for attempt in itertools.count():
+            await self.aacquire(tokens, priority)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as error:
+                if not self._should_retry(error, attempt):
+                    raise
+
+    def stream(self, open_stream, tokens=0, priority=BULK):
+        """
+        Start the generator returned by open_stream() once the buckets allow it and yield its chunks.
+        Quota errors raised before the first chunk restart the stream, later errors are raised.
+        """
+        for attempt in itertools.count():
+            self.acquire(tokens, priority)
+            stream = open_stream()
+            try:
+                first = next(stream, _EMPTY)
+                break
+            except Exception as error:
+                stream.close()
+                if not self._should_retry(error, attempt):
+                    raise
+
+        try:
+            if first is not _EMPTY:
+                yield first
+                yield from stream
+        finally:
+            stream.close()
+
+    async def astream(self, open_stream, tokens=0, priority=BULK):
+        """
+        Async counterpart of stream for an async generator returned by open_stream().
+        """
+        for attempt in itertools.count():
+            await self.aacquire(tokens, priority)
+            stream = open_stream()
+            try:
+                first = await stream.__anext__()
+                break
+            except StopAsyncIteration:
+                first = _EMPTY
+                break
+            except Exception as error:
+                await stream.aclose()
+                if not self._should_retry(error, attempt):
+                    raise
+
+        try:
+            if first is not _EMPTY:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> dict:
+        """
+        Return the queue depth per priority class and the capacity left in the buckets.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "queue_depth": {PRIORITY_NAMES[priority]: depth for priority, depth in self._depths.items()},
+                "requests_available": self._requests,
+                "tokens_available": self._tokens if self.tokens_per_minute else None,
+                "paused_seconds": max(0.0, self._paused_until - now),
+            }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# Process-wide scheduler shared by every Vertex AI call of every session
+rate_limiter = RateLimiter(
+    requests_per_minute=_env_int("QUIZIFY_REQUESTS_PER_MINUTE", 300),
+    tokens_per_minute=_env_int("QUIZIFY_TOKENS_PER_MINUTE")
+)
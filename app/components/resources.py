@@ -0,0 +1,196 @@
+import threading
+import time
+
+
+class ResourceCache:
+    """
+    A process-wide cache of expensive, shareable objects such as model clients.
+    Objects are created once per key and shared by every session and Streamlit rerun.
+
+    Objects are built outside the cache lock, under a lock of their own key, so a slow factory (e.g., a
+    client's auth handshake) only holds up the callers waiting for that same key.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """
+        Return the object cached under key, creating it with factory() on first use.
+        """
+        with self._lock:
+            if key in self._resources:
+                self.hits += 1
+                return self._resources[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another caller may have built the object while this one waited for the key
+            with self._lock:
+                if key in self._resources:
+                    self.hits += 1
+                    return self._resources[key]
+                self.misses += 1
+            try:
+                resource = factory()
+                with self._lock:
+                    self._resources[key] = resource
+                return resource
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def peek(self, key):
+        """
+        Return the object cached under key, or None if it wasn't created yet. Never calls a factory.
+        """
+        with self._lock:
+            return self._resources.get(key)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._resources)}
+
+
+class SessionCache:
+    """
+    Per-session objects (e.g., vector collections) with idle-time eviction.
+
+    Sessions that haven't been touched for idle_timeout seconds are dropped, and once there are more
+    than max_sessions the least recently used sessions are dropped too, so memory stays bounded as
+    sessions pile up. As in ResourceCache, objects are built outside the cache lock.
+    """
+
+    def __init__(self, idle_timeout=30 * 60, max_sessions=100):
+        """
+        :param idle_timeout: Seconds of inactivity after which a session's objects are evicted
+        :param max_sessions: Maximum number of sessions kept at once
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = {}  # session_id -> (last_access, {name: object})
+        self._key_locks = {}  # (session_id, name) -> lock held while the object is built
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id, name, factory):
+        """
+        Return the object stored under name for a session, creating it with factory() on first use.
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            _, objects = self._sessions.get(session_id, (now, {}))
+            self._sessions[session_id] = (now, objects)
+            if name in objects:
+                self.hits += 1
+                return objects[name]
+            key_lock = self._key_locks.setdefault((session_id, name), threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                _, objects = self._sessions.get(session_id, (now, {}))
+                if name in objects:
+                    self.hits += 1
+                    return objects[name]
+                self.misses += 1
+            try:
+                value = factory()
+                now = time.time()
+                with self._lock:
+                    # The session may have been evicted meanwhile; an object put() meanwhile is newer and wins
+                    self._evict(now)
+                    _, objects = self._sessions.get(session_id, (now, {}))
+                    value = objects.setdefault(name, value)
+                    self._sessions[session_id] = (now, objects)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop((session_id, name), None)
+
+    def put(self, session_id, name, value):
+        """
+        Store an object under name for a session, replacing the previous one.
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            _, objects = self._sessions.get(session_id, (now, {}))
+            objects[name] = value
+            self._sessions[session_id] = (now, objects)
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, now):
+        expired = [
+            session_id for session_id, (last_access, _) in self._sessions.items()
+            if now - last_access > self.idle_timeout
+        ]
+        overflow = len(self._sessions) - len(expired) - self.max_sessions + 1
+        if overflow > 0:
+            by_age = sorted(
+                (item for item in self._sessions.items() if item[0] not in expired),
+                key=lambda item: item[1][0]
+            )
+            expired.extend(session_id for session_id, _ in by_age[:overflow])
+        for session_id in expired:
+            del self._sessions[session_id]
+        self.evictions += len(expired)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "sessions": len(self._sessions),
+        }
+
+
+shared_resources = ResourceCache()
+session_resources = SessionCache()
+
+
+def _config_key(kind, config):
+    return (kind, tuple(sorted(config.items())))
+
+
+def get_embedding_client(**config):
+    """
+    Return the process-wide EmbeddingClient for a configuration.
+    """
+    from components.embedding_client import EmbeddingClient
+    return shared_resources.get(_config_key("embedding_client", config), lambda: EmbeddingClient(**config))
+
+
+def peek_embedding_client(**config):
+    """
+    Return the process-wide EmbeddingClient for a configuration if it was already created, otherwise None.
+    """
+    return shared_resources.peek(_config_key("embedding_client", config))
+
+
+def get_llm(**config):
+    """
+    Return the process-wide VertexAI LLM client for a configuration.
+    """
+    from langchain_google_vertexai import VertexAI
+    return shared_resources.get(_config_key("llm", config), lambda: VertexAI(**config))
+
+
+def stats():
+    """
+    Return the statistics of the shared and per-session caches and of the rate limiter.
+    """
+    from components.rate_limiter import rate_limiter
+    return {
+        "shared": shared_resources.stats(),
+        "sessions": session_resources.stats(),
+        "rate_limiter": rate_limiter.stats(),
+    }
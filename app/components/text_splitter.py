@@ -0,0 +1,155 @@
+import hashlib
+import re
+from collections import Counter
+
+from components.metrics import metrics, estimate_tokens
+from components.question_index import QuestionIndex
+
+
+class ChunkSplitter:
+    """
+    Splits page Documents into chunks sized by token count, without the boilerplate that repeats on
+    every page and without duplicate chunks.
+
+    Lines that repeat across many pages of a document (running headers, footers, page numbers) are
+    learned from the first pages of every document and stripped before splitting. Chunks whose text
+    was already emitted for the same document, exactly or nearly (MinHash similarity), are dropped
+    before they are embedded. Duplicates are only dropped within a document, since documents are
+    stored and deleted independently and a chunk dropped as a duplicate of another document's chunk
+    would be lost once that document is deleted. Pages are processed as a stream, holding at most
+    sample_pages pages per document in memory.
+    """
+
+    def __init__(self, chunk_tokens=256, overlap_tokens=32, length_function=estimate_tokens,
+                 sample_pages=20, boilerplate_min_pages=3, boilerplate_fraction=0.5,
+                 near_duplicate_threshold=0.9):
+        """
+        :param chunk_tokens: Maximum number of tokens per chunk
+        :param overlap_tokens: Number of tokens shared by consecutive chunks
+        :param length_function: Callable returning the token count of a text
+        :param sample_pages: Number of leading pages of a document used to learn its boilerplate
+        :param boilerplate_min_pages: Minimum number of pages a line must appear on to be boilerplate
+        :param boilerplate_fraction: Minimum share of the sampled pages a line must appear on to be boilerplate
+        :param near_duplicate_threshold: MinHash similarity at or above which a chunk counts as a duplicate
+        """
+        self.length_function = length_function
+        self.sample_pages = sample_pages
+        self.boilerplate_min_pages = boilerplate_min_pages
+        self.boilerplate_fraction = boilerplate_fraction
+        self.near_duplicate_threshold = near_duplicate_threshold
+
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_tokens,
+            chunk_overlap=overlap_tokens,
+            length_function=length_function
+        )
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the chunks seen so far and clear the statistics.
+        """
+        self._forget_chunks()
+        self.stats = {
+            "pages": 0,
+            "chunks": 0,
+            "boilerplate_lines_removed": 0,
+            "duplicate_chunks_dropped": 0,
+            "tokens_saved": 0,
+        }
+
+    def _forget_chunks(self):
+        """
+        Forget the chunks seen so far, when a new document starts.
+        """
+        self._seen_hashes = set()
+        # Only the digests and MinHash signatures of the chunks are kept, not their text
+        self._near_duplicates = QuestionIndex(threshold=self.near_duplicate_threshold, keep_texts=False)
+
+    @staticmethod
+    def _line_key(line):
+        # Page numbers and dates change from page to page, so compare lines with digits masked
+        return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+    def split_documents(self, pages) -> list:
+        return list(self.split_pages(pages))
+
+    def split_pages(self, pages):
+        """
+        Lazily split an iterable of page Documents into chunk Documents.
+        """
+        buffer = []
+        current_document = None
+        boilerplate = None
+
+        for page in pages:
+            self.stats["pages"] += 1
+            document = page.metadata.get("doc_hash")
+            if document != current_document:
+                yield from self._split_buffer(buffer, boilerplate)
+                buffer, boilerplate, current_document = [], None, document
+                self._forget_chunks()
+
+            if boilerplate is None:
+                buffer.append(page)
+                if len(buffer) >= self.sample_pages:
+                    boilerplate = self._detect_boilerplate(buffer)
+                    yield from self._split_buffer(buffer, boilerplate)
+                    buffer = []
+            else:
+                yield from self._split_page(page, boilerplate)
+
+        yield from self._split_buffer(buffer, boilerplate)
+
+    def _split_buffer(self, buffer, boilerplate):
+        if not buffer:
+            return
+        if boilerplate is None:
+            boilerplate = self._detect_boilerplate(buffer)
+        for page in buffer:
+            yield from self._split_page(page, boilerplate)
+
+    def _detect_boilerplate(self, pages) -> set:
+        """
+        Return the line keys that appear on enough of the given pages to be boilerplate.
+        """
+        if len(pages) < self.boilerplate_min_pages:
+            return set()
+        counts = Counter()
+        for page in pages:
+            counts.update({self._line_key(line) for line in page.page_content.splitlines() if line.strip()})
+        threshold = max(self.boilerplate_min_pages, self.boilerplate_fraction * len(pages))
+        return {key for key, count in counts.items() if count >= threshold}
+
+    def _split_page(self, page, boilerplate):
+        with metrics.span("split"):
+            chunks = self._split_page_text(page, boilerplate)
+        yield from chunks
+
+    def _split_page_text(self, page, boilerplate) -> list:
+        from langchain_core.documents import Document
+
+        chunks = []
+        lines = []
+        for line in page.page_content.splitlines():
+            if line.strip() and self._line_key(line) in boilerplate:
+                self.stats["boilerplate_lines_removed"] += 1
+                self.stats["tokens_saved"] += self.length_function(line)
+            else:
+                lines.append(line)
+
+        for text in self._splitter.split_text("\n".join(lines)):
+            normalized = " ".join(text.lower().split())
+            text_hash = hashlib.sha256(normalized.encode("utf-8")).digest()
+            # The signature is only computed for chunks that aren't exact duplicates, and only once
+            signature = None if text_hash in self._seen_hashes else self._near_duplicates.signature(normalized)
+            if signature is None or self._near_duplicates.is_duplicate(normalized, signature):
+                self.stats["duplicate_chunks_dropped"] += 1
+                self.stats["tokens_saved"] += self.length_function(text)
+                continue
+            self._seen_hashes.add(text_hash)
+            self._near_duplicates.add(normalized, signature)
+            self.stats["chunks"] += 1
+            chunks.append(Document(page_content=text, metadata=dict(page.metadata)))
+        return chunks
@@ -0,0 +1,333 @@
+import os
+import time
+from typing import TYPE_CHECKING
+import streamlit as st
+from components.batch_embedder import BatchEmbedder
+from components.document_registry import DocumentRegistry
+from components.ingest_pipeline import IngestPipeline
+from components.metrics import metrics
+from components.text_splitter import ChunkSplitter
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+
+class VectorCollectionCreator:
+    """
+    The ingestion logic shared by the collection creators, independent of where the chunks are stored.
+
+    Uploaded documents are diffed against the store, new ones are streamed through split -> embed ->
+    upsert, and the stored chunks are queried by QuizGenerator. Subclasses own the store and implement
+    the storage methods below: ChromaCollectionCreator keeps the chunks in a Chroma collection and
+    NumpyCollectionCreator in an in-process VectorIndex. Which documents are completely indexed is
+    recorded in a DocumentRegistry next to the store.
+
+    One persistent collection holds the documents of all sessions, each document once, and searches are
+    restricted to the documents of the creator's document set (document_hashes). Documents nobody used
+    for ttl_seconds are deleted.
+    """
+
+    # Name of the store in the messages shown to the user
+    store_label = "Collection"
+
+    def __init__(self, processor, embed_model, max_workers=4, persist_directory=None, collection_name="quizify",
+                 chunk_tokens=256, chunk_overlap_tokens=32, show_status=True, lease_seconds=300,
+                 ttl_seconds=7 * 24 * 60 * 60):
+        """
+        :param processor: An instance of DocumentProcessor that has processed documents.
+        :param embed_model: An embedding client for embedding documents
+        :param max_workers: Maximum number of embedding batches sent to the provider at once
+        :param persist_directory: Optional directory where the collection is persisted between sessions
+        :param collection_name: Name of the collection holding the indexed documents
+        :param chunk_tokens: Maximum number of tokens per chunk
+        :param chunk_overlap_tokens: Number of tokens shared by consecutive chunks
+        :param show_status: Whether progress and messages are shown with Streamlit elements; headless callers
+                            (CLI, API) pass False to have them printed instead
+        :param lease_seconds: Seconds an ingestion may go without progress before other sessions consider it
+                              interrupted and delete the chunks it stored
+        :param ttl_seconds: Seconds after which documents no session used are deleted from the collection
+        """
+        self.processor = processor
+        self.embed_model = BatchEmbedder(embed_model, max_workers=max_workers)
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.show_status = show_status
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self.registry = None
+        # The documents searched by this creator, set by create_chroma_collection or open_document_set
+        self.document_hashes = []
+
+    def create_chroma_collection(self):
+        """
+        Create or update the collection from the documents processed by the DocumentProcessor instance.
+
+        Chunks are stored with the content hash of the document they came from. Documents that are already
+        indexed, by any session, are skipped and new documents are split and upserted, so a previously seen
+        document is ready without re-splitting or re-embedding. Searches are then restricted to the uploaded
+        documents. Documents of other sessions are only deleted once nobody used them for ttl_seconds, or
+        once their ingestion was interrupted.
+
+        New documents are streamed page by page through an IngestPipeline, so chunks become searchable
+        while later pages are still being parsed and memory stays bounded for large documents.
+        """
+
+        # Step 1: Check for processed documents
+        self.document_hashes = list(self.processor.document_hashes)
+        if len(self.processor.document_hashes) == 0:
+            self._notify("error", "No documents found!", "🚨")
+            return
+
+        # Step 2: Open the (persistent) collection and diff it against the uploaded documents
+        self._open()
+
+        # The diff, the deletions and the claim of the new documents run in one registry transaction,
+        # so sessions and processes sharing the collection can't delete each other's documents
+        with self.registry.transaction():
+            self._refresh()
+            current_hashes = set(self.processor.document_hashes)
+            indexed_hashes = self.indexed_document_hashes() & current_hashes
+            self.registry.touch(indexed_hashes)
+
+            # Delete documents nobody used for ttl_seconds, and the chunks of interrupted ingestions.
+            # Documents another session is ingesting right now are kept, ingestion is idempotent
+            removed_hashes = (self.registry.unused_hashes(self.ttl_seconds) - current_hashes) \
+                | self.registry.interrupted_hashes(self.lease_seconds)
+            for doc_hash in removed_hashes:
+                self._delete_document(doc_hash)
+                self.registry.forget(doc_hash)
+
+            new_hashes = [doc_hash for doc_hash in self.processor.document_hashes if doc_hash not in indexed_hashes]
+            self.registry.claim(new_hashes)
+            self.registry.add_document_set(self.processor.document_set_id(), self.processor.document_hashes)
+            self._flush()
+        if not new_hashes:
+            self._notify("success", "All documents are already indexed!", "✅")
+            return
+
+        # Step 3: Stream the new documents through split -> embed -> upsert
+        # The splitter strips repeated headers/footers and drops duplicate chunks before embedding
+        self._text_splitter = ChunkSplitter(
+            chunk_tokens=self.chunk_tokens,
+            overlap_tokens=self.chunk_overlap_tokens
+        )
+        self._chunk_counts = {}
+
+        total_pages = max(1, self.processor.page_count(new_hashes))
+        progress_bar = st.progress(0.0, text="Indexing documents...") if self.show_status else None
+        last_renewal = time.monotonic()
+
+        def report_progress(stats):
+            # Renew the lease of the new documents a few times per lease period while chunks are stored
+            nonlocal last_renewal
+            if time.monotonic() - last_renewal > self.lease_seconds / 4:
+                self.registry.renew(new_hashes)
+                last_renewal = time.monotonic()
+            if progress_bar is None:
+                return
+            progress_bar.progress(
+                min(1.0, stats["pages"] / total_pages),
+                text=f"Parsed {stats['pages']}/{total_pages} pages, indexed {stats['chunks']} chunks"
+            )
+
+        # Every pipeline batch holds one adaptively sized embedding batch per worker, so the BatchEmbedder
+        # keeps max_workers requests in flight however its batch size changes
+        pipeline = IngestPipeline(
+            split=self._split_pages,
+            embed=self.embed_model.embed_documents,
+            upsert=self._upsert_chunks,
+            batch_size=lambda: self.embed_model.batch_size * self.embed_model.max_workers,
+            on_progress=report_progress
+        )
+        with metrics.span("ingest"):
+            stats = pipeline.run(self.processor.iter_pages(new_hashes))
+            # A document only counts as indexed once all of its chunks are stored, so one whose
+            # ingestion failed part way is ingested again instead of being skipped. Documents
+            # without chunks are recorded too, so they aren't parsed again on every submit
+            with self.registry.transaction():
+                self._refresh()
+                self._flush()
+                for doc_hash in new_hashes:
+                    self._mark_complete(doc_hash, self._chunk_counts.get(doc_hash, 0))
+        if progress_bar is not None:
+            progress_bar.empty()
+
+        if stats["chunks"] > 0:
+            split_stats = self._text_splitter.stats
+            metrics.increment("duplicate_chunks_dropped", split_stats["duplicate_chunks_dropped"])
+            metrics.increment("boilerplate_lines_removed", split_stats["boilerplate_lines_removed"])
+            self._notify("success", f"Successfully split pages in {stats['chunks']} documents!", "✅")
+            self._notify(
+                "info",
+                f"Dropped {split_stats['duplicate_chunks_dropped']} duplicate chunks and "
+                f"{split_stats['boilerplate_lines_removed']} boilerplate lines "
+                f"(~{split_stats['tokens_saved']} tokens not embedded).",
+                "ℹ️"
+            )
+            self._notify("success", f"Successfully created {self.store_label}!", "✅")
+        else:
+            self._notify("error", f"Failed to create {self.store_label}!", "🚨")
+
+    def _notify(self, kind, message, icon):
+        """
+        Show a Streamlit message of the given kind ("success", "info" or "error"), or print it when headless.
+        """
+        if self.show_status:
+            getattr(st, kind)(message, icon=icon)
+        else:
+            print(f"[{self.collection_name}] {message}")
+
+    def open_document_set(self, document_set_id) -> bool:
+        """
+        Restrict the searches to a document set indexed earlier (e.g., by another process), without
+        ingesting anything.
+
+        :param document_set_id: Id of the document set (see DocumentProcessor.document_set_id)
+        :return: True if every document of the set is indexed
+        """
+        if not self.is_open() and not self._collection_exists():
+            return False
+        self._open()
+        with self.registry.transaction():
+            self._refresh()
+            doc_hashes = self.registry.document_set(document_set_id)
+            if doc_hashes is None or not set(doc_hashes) <= self.indexed_document_hashes():
+                return False
+            # Keep the documents from being cleaned up while the set is in use
+            self.registry.touch(doc_hashes)
+        self.document_hashes = doc_hashes
+        return True
+
+    def _open(self):
+        """
+        Open the store and its document registry, unless they are open already.
+        """
+        if not self.is_open():
+            self._open_collection()
+        if self.registry is None:
+            path = ":memory:"
+            if self.persist_directory:
+                path = os.path.join(self.persist_directory, f"{self.collection_name}-documents.sqlite3")
+            self.registry = DocumentRegistry(path)
+
+    def _mark_complete(self, doc_hash, chunks):
+        """
+        Record a document as indexed once every one of its chunks, possibly none, is stored.
+        """
+        self.registry.mark_complete(doc_hash, chunks)
+
+    def _refresh(self):
+        """
+        Pick up the changes other processes made to the store. Called at the start of every registry
+        transaction; stores that always see the changes of other processes, like Chroma, do nothing.
+        """
+
+    def _flush(self):
+        """
+        Make the changes of this creator visible to other processes before the registry transaction ends.
+        Stores that write every change through, like Chroma, do nothing.
+        """
+
+    def indexed_document_hashes(self) -> set:
+        """
+        Return the content hashes of the documents whose chunks are all stored.
+        """
+        if self.registry is None:
+            return set()
+        return self.registry.complete_hashes()
+
+    def _split_pages(self, pages):
+        """
+        Lazily split pages into chunks and assign each chunk an id derived from its document hash,
+        so re-adding a document overwrites its chunks.
+        """
+        for chunk in self._text_splitter.split_pages(pages):
+            doc_hash = chunk.metadata["doc_hash"]
+            self._chunk_counts[doc_hash] = self._chunk_counts.get(doc_hash, 0) + 1
+            chunk.metadata["chunk_id"] = f"{doc_hash}-{self._chunk_counts[doc_hash]}"
+            yield chunk
+
+    def query_chroma_collection(self, query) -> "Document":
+        """
+        Queries the collection for documents similar to the query.
+        :param query: The query string to search for in the collection
+        """
+        if self.is_open():
+            docs = self.similarity_search_with_relevance_scores(query)
+            if docs:
+                return docs[0]
+            else:
+                self._notify("error", "No matching document found!", "🚨")
+        else:
+            self._notify("error", f"{self.store_label} has not been created!", "🚨")
+
+    # Storage methods implemented by the subclasses
+
+    def is_open(self) -> bool:
+        """
+        Return True once the store was opened (or created).
+        """
+        raise NotImplementedError
+
+    def _collection_exists(self) -> bool:
+        """
+        Check for the persisted store without creating it.
+        """
+        raise NotImplementedError
+
+    def _open_collection(self):
+        """
+        Open the store, persisted to disk when a persist_directory is set.
+        """
+        raise NotImplementedError
+
+    def _delete_document(self, doc_hash):
+        """
+        Remove all chunks of a document from the store.
+        """
+        raise NotImplementedError
+
+    def _upsert_chunks(self, chunks, vectors):
+        """
+        Store a batch of already embedded chunks.
+        """
+        raise NotImplementedError
+
+    def stored_document_hashes(self) -> set:
+        """
+        Return the content hashes of all documents with stored chunks, complete or not.
+        """
+        raise NotImplementedError
+
+    def chunk_count(self) -> int:
+        """
+        Return the number of stored chunks of all documents.
+        """
+        raise NotImplementedError
+
+    def similarity_search_with_relevance_scores(self, query, k=4) -> list:
+        """
+        Return the k chunks of document_hashes most similar to the query as (Document, relevance score) tuples.
+        """
+        raise NotImplementedError
+
+    def retrieve_with_vectors(self, query, k=20):
+        """
+        Run a single similarity search over the chunks of document_hashes and return the matching chunks
+        together with their embeddings, so callers can re-rank or sample them locally without querying
+        the store again.
+
+        :param query: The query string to search for in the store
+        :param k: Number of chunks to retrieve
+        :return: A tuple (query_vector, [(Document, vector), ...])
+        """
+        raise NotImplementedError
+
+    def as_retriever(self, k=4):
+        """
+        Return a runnable that maps a query to its k most similar chunks of document_hashes, usable like a
+        LangChain retriever.
+        """
+        raise NotImplementedError
@@ -0,0 +1,228 @@
+import json
+import os
+
+DTYPES = ("float16", "int8")
+
+
+class VectorIndex:
+    """
+    A small in-process vector index that keeps every vector in one contiguous, quantized NumPy array.
+
+    Vectors are L2 normalized and stored as float16, or as int8 with one float32 scale per row, so an
+    index takes a half or a quarter of the memory of float32 vectors. A query scores all rows with a
+    single matrix product (in blocks of block_rows rows for large indexes) and selects the top k with
+    argpartition. The array can be saved to disk and loaded back memory mapped.
+    """
+
+    def __init__(self, dtype="float16", block_rows=8192):
+        """
+        :param dtype: Storage type of the vectors, "float16" or "int8"
+        :param block_rows: Maximum number of rows converted to float32 at once while scoring
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {DTYPES}.")
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._rows = {}
+        self._vectors = None
+        self._scales = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _normalize(vectors):
+        import numpy as np
+
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _quantize(self, matrix):
+        """
+        Convert normalized float32 rows to the storage type and return them with their row scales.
+        """
+        import numpy as np
+
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), np.ones(len(matrix), dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _reserve(self, rows, dimensions):
+        """
+        Make room for rows more vectors, doubling the capacity so appends are amortized O(1).
+        """
+        import numpy as np
+
+        if self._vectors is None:
+            capacity = max(rows, 64)
+            self._vectors = np.zeros((capacity, dimensions), dtype=self.dtype)
+            self._scales = np.ones(capacity, dtype=np.float32)
+            return
+        if self._vectors.shape[1] != dimensions:
+            raise ValueError(f"Expected vectors of size {self._vectors.shape[1]}, got {dimensions}.")
+
+        capacity = len(self._vectors)
+        if self._size + rows > capacity:
+            capacity = max(capacity * 2, self._size + rows)
+        elif self._vectors.flags.writeable:
+            return
+        # Grow the array, or copy a read-only memory mapped array before the first write
+        vectors = np.zeros((capacity, dimensions), dtype=self.dtype)
+        scales = np.ones(capacity, dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        scales[:self._size] = self._scales[:self._size]
+        self._vectors, self._scales = vectors, scales
+
+    def upsert(self, ids, vectors, documents, metadatas):
+        """
+        Insert vectors with their documents and metadata, replacing the entries of ids already present.
+        """
+        if not ids:
+            return
+        quantized, scales = self._quantize(self._normalize(vectors))
+        self._reserve(len(set(ids) - self._rows.keys()), quantized.shape[1])
+
+        rows = []
+        for id, document, metadata in zip(ids, documents, metadatas):
+            row = self._rows.get(id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[id] = row
+                self.ids.append(id)
+                self.documents.append(document)
+                self.metadatas.append(metadata)
+            else:
+                self.documents[row] = document
+                self.metadatas[row] = metadata
+            rows.append(row)
+        self._vectors[rows] = quantized
+        self._scales[rows] = scales
+
+    def delete(self, ids):
+        """
+        Remove the entries of ids and compact the array.
+        """
+        import numpy as np
+
+        removed = {self._rows[id] for id in ids if id in self._rows}
+        if not removed:
+            return
+        keep = np.array([row not in removed for row in range(self._size)])
+        self._reserve(0, self._vectors.shape[1])
+        size = int(keep.sum())
+        self._vectors[:size] = self._vectors[:self._size][keep]
+        self._scales[:size] = self._scales[:self._size][keep]
+        self.ids = [id for row, id in enumerate(self.ids) if keep[row]]
+        self.documents = [document for row, document in enumerate(self.documents) if keep[row]]
+        self.metadatas = [metadata for row, metadata in enumerate(self.metadatas) if keep[row]]
+        self._rows = {id: row for row, id in enumerate(self.ids)}
+        self._size = size
+
+    def where(self, key, value) -> list:
+        """
+        Return the ids of the entries whose metadata has the given value for key.
+        """
+        return [id for id, metadata in zip(self.ids, self.metadatas) if metadata.get(key) == value]
+
+    def rows_where(self, key, values) -> list:
+        """
+        Return the rows of the entries whose metadata has one of the given values for key.
+        """
+        values = set(values)
+        return [row for row, metadata in enumerate(self.metadatas) if metadata.get(key) in values]
+
+    def search(self, query_vector, k=4, rows=None) -> list:
+        """
+        Return the rows of the k vectors most similar to the query as (row, cosine similarity) tuples,
+        most similar first.
+
+        :param rows: Optional rows to restrict the search to, e.g., from rows_where()
+        """
+        import numpy as np
+
+        if self._size == 0 or k <= 0:
+            return []
+        query = self._normalize(query_vector)[0]
+        if query.shape[0] != self._vectors.shape[1]:
+            raise ValueError(f"Expected a query vector of size {self._vectors.shape[1]}, got {query.shape[0]}.")
+
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, self.block_rows):
+            end = min(start + self.block_rows, self._size)
+            scores[start:end] = self._vectors[start:end].astype(np.float32) @ query
+        scores *= self._scales[:self._size]
+
+        candidates = np.arange(self._size) if rows is None else np.asarray(rows, dtype=np.int64)
+        if len(candidates) == 0:
+            return []
+        scores = scores[candidates]
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def vector(self, row) -> list:
+        """
+        Return the dequantized vector stored in a row.
+        """
+        return (self._vectors[row].astype("float32") * self._scales[row]).tolist()
+
+    def save(self, path):
+        """
+        Write the index to a directory: the vectors and scales as .npy files and the rest as JSON.
+        Files are replaced atomically, so an index memory mapped from the same directory stays valid.
+        """
+        import numpy as np
+
+        os.makedirs(path, exist_ok=True)
+        if self._vectors is None:
+            arrays = {"vectors.npy": np.zeros((0, 0), dtype=self.dtype), "scales.npy": np.ones(0, dtype=np.float32)}
+        else:
+            arrays = {"vectors.npy": self._vectors[:self._size], "scales.npy": self._scales[:self._size]}
+        for name, array in arrays.items():
+            temporary = os.path.join(path, f".{name}.tmp")
+            with open(temporary, "wb") as file:
+                np.save(file, array)
+            os.replace(temporary, os.path.join(path, name))
+
+        temporary = os.path.join(path, ".entries.json.tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({
+                "dtype": self.dtype,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+            }, file)
+        os.replace(temporary, os.path.join(path, "entries.json"))
+
+    @classmethod
+    def load(cls, path, mmap=True, block_rows=8192):
+        """
+        Load an index written by save(). With mmap the vectors are memory mapped read-only and only
+        copied into memory when the index is modified.
+        """
+        import numpy as np
+
+        with open(os.path.join(path, "entries.json"), encoding="utf-8") as file:
+            entries = json.load(file)
+        index = cls(dtype=entries["dtype"], block_rows=block_rows)
+        index.ids = entries["ids"]
+        index.documents = entries["documents"]
+        index.metadatas = entries["metadatas"]
+        index._rows = {id: row for row, id in enumerate(index.ids)}
+        index._size = len(index.ids)
+        if index._size:
+            mmap_mode = "r" if mmap else None
+            index._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mmap_mode)
+            index._scales = np.load(os.path.join(path, "scales.npy"), mmap_mode=mmap_mode)
+        return index
@@ -0,0 +1,84 @@
+"""
+Background warm-up and import-time profiling of the heavy dependencies.
+
+The components import their heavy dependencies lazily, only when the stage that needs them runs.
+warm_up() imports them on a background thread right after the first page render, so the first
+ingestion or quiz doesn't pay for them either. Run this module to print an import-time profile:
+
+    python -m components.warmup
+"""
+import importlib
+import json
+import re
+import subprocess
+import sys
+import threading
+
+# Heavy modules in the order the app needs them
+HEAVY_MODULES = [
+    "pypdf",
+    "langchain_core.documents",
+    "langchain.text_splitter",
+    "langchain_google_vertexai",
+    "chromadb",
+    "langchain_community.vectorstores",
+    "langchain_core.prompts",
+]
+
+_started = False
+_lock = threading.Lock()
+
+
+def warm_up(modules=HEAVY_MODULES):
+    """
+    Import modules on a daemon thread. Only the first call in a process starts the thread.
+
+    :return: The warm-up thread, or None if warm-up already started
+    """
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+
+    def run():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError as error:
+                print(f"Warm-up could not import {module}: {error}")
+
+    thread = threading.Thread(target=run, name="quizify-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def profile_imports(modules=HEAVY_MODULES) -> list:
+    """
+    Measure the cold import time of each module in a fresh interpreter using -X importtime.
+
+    :return: A list of dicts with the module name and its cumulative import time in milliseconds
+    """
+    report = []
+    for module in modules:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True
+        )
+        # Each line reads "import time: self [us] | cumulative | imported package"
+        cumulative = 0
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)", line)
+            if match and match.group(2) == module:
+                cumulative = int(match.group(1))
+        report.append({
+            "module": module,
+            "cumulative_ms": cumulative / 1000,
+            "ok": result.returncode == 0,
+        })
+    return sorted(report, key=lambda entry: entry["cumulative_ms"], reverse=True)
+
+
+if __name__ == "__main__":
+    print(json.dumps(profile_imports(), indent=2))
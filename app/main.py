@@ -2,21 +2,102 @@ import streamlit as st
 import os
 import sys
 import json
+import asyncio
+import uuid
 
 from components.chroma_collection import ChromaCollectionCreator
+from components.numpy_collection import NumpyCollectionCreator
 from components.document_processor import DocumentProcessor
-from components.embedding_client import EmbeddingClient
 from components.quiz_generator import QuizGenerator
 from components.quiz_manager import QuizManager
+from components.question_pool import QuestionPool
+from components.question_store import BankExpired, QuestionStore
+from components.rate_limiter import BULK
+from components import resources
+from components.metrics import render_debug_panel
+from components.warmup import warm_up
+
+
+def get_question_pool():
+    """
+    Process-wide pool of pre-generated questions shared by all sessions.
+    """
+    return resources.shared_resources.get(
+        "question_pool",
+        lambda: QuestionPool(os.path.join(".cache", "question_pool.sqlite3"))
+    )
+
+
+def get_question_store():
+    """
+    Process-wide store of the question banks being served; sessions only keep a paged view of their bank.
+    """
+    return resources.shared_resources.get(
+        "question_store",
+        lambda: QuestionStore(os.path.join(".cache", "question_store.sqlite3"))
+    )
+
+
+async def collect_quiz(generator, status):
+    """
+    Generate the quiz concurrently, reporting each question as soon as it is ready.
+    """
+    async for _ in generator.astream_quiz():
+        status.write(f"Generated {len(generator.question_bank)}/{generator.num_questions} questions")
+    return generator.question_bank
+
+
+def reset_quiz():
+    """
+    Drop the session's question bank and return to the Quiz Builder.
+    """
+    st.session_state['question_bank'] = []
+    st.session_state['display_quiz'] = False
+    st.session_state['question_index'] = 0
+
+
+def navigate(quiz_manager, direction):
+    """
+    Move to the next or previous question, starting over if the stored bank expired in the meantime.
+    """
+    try:
+        quiz_manager.next_question_index(direction=direction)
+    except BankExpired:
+        reset_quiz()
 
 if __name__ == "__main__":
     
     embed_config = {
         "model_name": "textembedding-gecko@003",
         "project": "sample-mission-421421",
-        "location": "us-central1"
+        "location": "us-central1",
+        "cache_path": os.path.join(".cache", "embeddings.sqlite3"),
+        # "vertexai", or "hashing" to embed locally without calling Vertex AI
+        "backend": os.environ.get("QUIZIFY_EMBEDDING_BACKEND", "vertexai")
     }
+    # "chroma", or "numpy" to keep each session's chunks in a small in-memory index
+    vector_store = os.environ.get("QUIZIFY_VECTOR_STORE", "chroma")
     
+    # Import the heavy dependencies in the background while the user fills in the form
+    if os.environ.get("QUIZIFY_WARMUP", "1") != "0":
+        warm_up()
+
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+
+    # Show cache statistics of the shared clients and per-session collections. The embedding client is
+    # only reported once a submit created it, so rendering the page never builds (and authenticates) it
+    with st.sidebar.expander("Cache statistics"):
+        embed_client = resources.peek_embedding_client(**embed_config)
+        st.json({
+            **resources.stats(),
+            "embeddings": embed_client.cache_stats() if embed_client is not None else None
+        })
+
+    # Optional in-app metrics panel, enabled with QUIZIFY_DEBUG=1
+    if os.environ.get("QUIZIFY_DEBUG"):
+        render_debug_panel()
+
     # Add Session State
     if 'question_bank' not in st.session_state or len(st.session_state['question_bank']) == 0:
         
@@ -32,9 +113,7 @@ if __name__ == "__main__":
             with st.form("Load Data to Chroma"):
 
                 processor = DocumentProcessor()
-                processor.ingest_documents()
-                embed_client = EmbeddingClient(**embed_config) 
-                chroma_creator = ChromaCollectionCreator(processor, embed_client)
+                processor.ingest_documents(lazy=True)
 
                 st.write("Select PDFs for Ingestion, the topic for the quiz, and click Generate!")
                 
@@ -45,22 +124,64 @@ if __name__ == "__main__":
                 submitted = st.form_submit_button("Submit")
                 
                 if submitted:
-                    chroma_creator.create_chroma_collection()
-                        
-                    if len(processor.pages) > 0:
-                        st.write(f"Generating {num_question} questions for topic: {topic_input}")
-                    
-                    # Initialize a QuizGenerator class using the topic, number of questrions, and the chroma collection
-                    generator = QuizGenerator(topic_input, num_question, chroma_creator)
-                    question_bank = generator.generate_quiz()
-                    # Initialize the question bank list in st.session_state
-                    st.session_state.question_bank = question_bank
+                    # All sessions share one collection holding every document once, and each session only
+                    # searches the documents it uploaded. Vectors of different backends have different sizes
+                    # and can't share a collection.
+                    collection_name = "quizify" if embed_config["backend"] == "vertexai" \
+                        else f"quizify-{embed_config['backend']}"
+
+                    # Clients are shared process-wide and the collection creator is kept per session
+                    embed_client = resources.get_embedding_client(**embed_config)
+
+                    def create_collection_creator():
+                        if vector_store == "numpy":
+                            return NumpyCollectionCreator(processor, embed_client, collection_name=collection_name)
+                        return ChromaCollectionCreator(
+                            processor,
+                            embed_client,
+                            persist_directory=os.path.join(".cache", "chroma"),
+                            collection_name=collection_name
+                        )
+
+                    session_id = st.session_state['session_id']
+                    chroma_creator = resources.session_resources.get(session_id, "chroma_creator", create_collection_creator)
+                    chroma_creator.processor = processor
+
+                    # Serve the quiz from the question pool when this material and topic were seen before. The
+                    # pool is keyed by the uploaded documents, so it is checked before they are ingested
+                    question_pool = get_question_pool()
+                    pool_key = QuestionPool.pool_key(processor.document_hashes, topic_input)
+                    # Pool refills run in the background at bulk priority. They retrieve from the collection,
+                    # so on a hit they only run if the documents are still indexed
+                    generator_factory = lambda n, index: QuizGenerator(
+                        topic_input, n, chroma_creator, question_index=index, priority=BULK
+                    )
+                    indexed = chroma_creator.open_document_set(processor.document_set_id())
+                    question_bank = question_pool.get_quiz(
+                        pool_key, num_question, generator_factory if indexed else None
+                    )
+
+                    if question_bank is None:
+                        chroma_creator.create_chroma_collection()
+
+                        if len(processor.document_hashes) > 0:
+                            st.write(f"Generating {num_question} questions for topic: {topic_input}")
+
+                        # Initialize a QuizGenerator class using the topic, number of questrions, and the chroma collection.
+                        # The pool's questions are passed along, so the quiz doesn't repeat the ones it already holds
+                        generator = QuizGenerator(
+                            topic_input, num_question, chroma_creator, question_index=question_pool.question_index(pool_key)
+                        )
+                        question_bank = asyncio.run(collect_quiz(generator, st.empty()))
+                        # The refill starts once this quiz is in the pool, so it doesn't generate it again
+                        question_pool.add(pool_key, question_bank, generator_factory)
+                    # Store the questions on disk and keep only a paged view of them in st.session_state
+                    st.session_state.question_bank = get_question_store().create_bank(question_bank)
                     # Set a display_quiz flag in st.session_state to True
                     st.session_state['display_quiz'] = True
                     # Set the question_index to 0 in st.session_state
                     st.session_state['question_index'] = 0
-                    
-                    print(st.session_state.question_bank)
+
                     st.rerun()
 
 
@@ -70,20 +191,22 @@ if __name__ == "__main__":
             st.header("Generated Quiz Question: ")
             # quiz_manager = QuizManager(question_bank)
             quiz_manager = QuizManager(st.session_state['question_bank'])
-            
+
+            ##### YOUR CODE HERE #####
+            # Step 7: Set index_question using the Quiz Manager method get_question_at_index passing the st.session_state["question_index"]
+            try:
+                index_question = quiz_manager.get_question_at_index(st.session_state['question_index'])
+            except BankExpired:
+                # The stored bank expired while the session held it, start over in the Quiz Builder
+                reset_quiz()
+                st.rerun()
+            ##### YOUR CODE HERE #####
+
             # Format the question and display it
             with st.form("MCQ"):
-                ##### YOUR CODE HERE #####
-                # Step 7: Set index_question using the Quiz Manager method get_question_at_index passing the st.session_state["question_index"]
-                index_question = quiz_manager.get_question_at_index(st.session_state['question_index'])
-                ##### YOUR CODE HERE #####
                 
-                # Unpack choices for radio button
-                choices = []
-                for choice in index_question['choices']:
-                    key = choice['key']
-                    value = choice['value']
-                    choices.append(f"{key}) {value}")
+                # Choice labels are formatted once when the question is loaded from the store
+                choices = index_question.choice_labels
                 
                 # Display the Question
                 st.write(f"{st.session_state['question_index'] + 1}. {index_question['question']}")
@@ -96,8 +219,8 @@ if __name__ == "__main__":
                 answer_choice = st.form_submit_button("Submit")
                 
                 # Use the example below to navigate to the next and previous questions
-                st.form_submit_button("Next Question", on_click=lambda: quiz_manager.next_question_index(direction=1))
-                st.form_submit_button("Previous Question", on_click=lambda: quiz_manager.next_question_index(direction=-1))
+                st.form_submit_button("Next Question", on_click=lambda: navigate(quiz_manager, direction=1))
+                st.form_submit_button("Previous Question", on_click=lambda: navigate(quiz_manager, direction=-1))
                 
                 if answer_choice and answer is not None:
                     correct_answer_key = index_question['answer']
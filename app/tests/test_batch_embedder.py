@@ -0,0 +1,27 @@
+import pytest
+
+from components.batch_embedder import BatchEmbedder
+
+
+class QuotaExhaustedModel:
+    """
+    An embedding model whose rate limiter gave up: every call fails with a quota error.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        raise RuntimeError("429 Quota exceeded")
+
+
+def test_quota_error_shrinks_the_batch_and_is_raised_without_retrying():
+    model = QuotaExhaustedModel()
+    embedder = BatchEmbedder(model, batch_size=32, min_batch_size=4, max_workers=1)
+
+    with pytest.raises(RuntimeError, match="Quota"):
+        embedder.embed_documents([f"text {i}" for i in range(100)])
+
+    assert model.calls == 1
+    assert embedder.batch_size == 16
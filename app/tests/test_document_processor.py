@@ -0,0 +1,33 @@
+import threading
+
+from benchmarks.synthetic_pdf import make_pdf
+from components import document_processor
+from components.document_processor import DocumentProcessor
+
+
+def test_page_cache_is_safe_to_share_between_threads(monkeypatch):
+    # A cache smaller than the number of documents keeps evicting entries other threads are reading
+    monkeypatch.setattr(document_processor, "_PAGE_CACHE_SIZE", 2)
+    monkeypatch.setattr(document_processor, "_PAGE_CACHE", document_processor.OrderedDict())
+    pdfs = [(f"doc-{seed}.pdf", make_pdf(3, seed=seed)) for seed in range(6)]
+    errors = []
+
+    def worker(offset):
+        try:
+            for round in range(5):
+                processor = DocumentProcessor(max_workers=1)
+                lazy = (offset + round) % 2 == 0
+                processor.add_documents(pdfs[offset:] + pdfs[:offset], lazy=lazy)
+                assert processor.page_count() == 18
+                assert len(list(processor.iter_pages())) == 18
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert errors == []
+    assert len(document_processor._PAGE_CACHE) <= 6
@@ -0,0 +1,14 @@
+from components.question_pool import QuestionPool
+
+
+def test_question_index_rejects_questions_already_in_the_pool():
+    pool = QuestionPool()
+    pool_key = QuestionPool.pool_key(["a" * 64], "Light")
+    pool.add(pool_key, [{"question": "Which particle carries the energy of light between atoms?"}])
+
+    question_index = pool.question_index(pool_key)
+    assert question_index.is_duplicate("Which particle carries the energy of light between the atoms?")
+    assert not question_index.is_duplicate("What speeds up the chemical reactions inside a living cell?")
+    assert not pool.question_index(QuestionPool.pool_key(["b" * 64], "Light")).is_duplicate(
+        "Which particle carries the energy of light between atoms?"
+    )
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from components.rate_limiter import RateLimiter, INTERACTIVE, BULK
+
+
+def drained_limiter(requests_per_minute=6000):
+    """
+    A limiter whose request bucket is empty, so every caller has to queue for the next refill.
+    """
+    limiter = RateLimiter(requests_per_minute=requests_per_minute)
+    limiter._requests = 0.0
+    return limiter
+
+
+def test_interactive_callers_go_before_queued_bulk_callers():
+    limiter = drained_limiter(requests_per_minute=600)
+    order = []
+
+    async def caller(name, priority):
+        await limiter.aacquire(priority=priority)
+        order.append(name)
+
+    async def main():
+        bulk = asyncio.ensure_future(caller("bulk", BULK))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(caller("interactive", INTERACTIVE))
+        await asyncio.wait_for(asyncio.gather(bulk, interactive), timeout=5)
+
+    asyncio.run(main())
+    assert order == ["interactive", "bulk"]
+
+
+def test_acquire_refuses_to_block_a_running_event_loop():
+    limiter = drained_limiter()
+
+    async def main():
+        waiting = asyncio.ensure_future(limiter.aacquire(priority=INTERACTIVE))
+        await asyncio.sleep(0)
+        assert len(limiter._queue) == 1
+
+        with pytest.raises(RuntimeError):
+            limiter.acquire(priority=INTERACTIVE)
+        # The refused call left no ticket behind, so the queued async caller still gets through
+        assert len(limiter._queue) == 1
+        await asyncio.wait_for(waiting, timeout=5)
+
+    asyncio.run(main())
+    assert limiter._queue == []
+
+
+def test_sync_callers_in_threads_wait_behind_async_callers_without_deadlock():
+    limiter = drained_limiter()
+
+    async def main():
+        waiting = asyncio.ensure_future(limiter.aacquire(priority=INTERACTIVE))
+        await asyncio.sleep(0)
+        result = asyncio.to_thread(limiter.call, lambda: "embedded", priority=INTERACTIVE)
+        return await asyncio.wait_for(asyncio.gather(waiting, result), timeout=5)
+
+    assert asyncio.run(main())[1] == "embedded"
+
+
+def test_queued_async_callers_wait_without_polling():
+    limiter = drained_limiter(requests_per_minute=6000)
+    attempts = []
+    try_take = limiter._try_take
+
+    def counting_try_take(ticket, tokens):
+        attempts.append(ticket)
+        return try_take(ticket, tokens)
+
+    limiter._try_take = counting_try_take
+    order = []
+
+    async def caller(name, priority):
+        await limiter.aacquire(priority=priority)
+        order.append(name)
+
+    async def main():
+        callers = [asyncio.ensure_future(caller(f"bulk-{i}", BULK)) for i in range(10)]
+        await asyncio.sleep(0)
+        callers.append(asyncio.ensure_future(caller("interactive", INTERACTIVE)))
+        await asyncio.wait_for(asyncio.gather(*callers), timeout=5)
+
+    asyncio.run(main())
+    # Every caller tries once when queued, and about once when it reaches the head and once after its refill
+    assert len(attempts) <= 4 * 11
+    assert order.index("interactive") <= 1
+    assert limiter._waiters == {}
+
+
+def test_quota_errors_pause_and_retry_the_call():
+    limiter = RateLimiter(requests_per_minute=6000, backoff=0.01, max_backoff=0.05)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError("429 Quota exceeded")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 3
+
+
+def test_astream_quiz_retrieves_context_off_the_event_loop():
+    """
+    Regression test: a second API job's retrieval (a blocking, rate limited embedding call) used to run
+    on the event loop while an earlier job's ticket was queued, and neither could ever proceed.
+    """
+    from langchain_core.documents import Document
+
+    from benchmarks.fakes import FakeLLM
+    from components.quiz_generator import QuizGenerator
+
+    limiter = drained_limiter()
+
+    class RateLimitedStore:
+        def retrieve_with_vectors(self, query, k=20):
+            query_vector = limiter.call(lambda: [1.0, 0.0], priority=INTERACTIVE)
+            chunks = [
+                (Document(page_content=f"Chunk {i} about {query}."), [1.0, i / k])
+                for i in range(k)
+            ]
+            return query_vector, chunks
+
+    generator = QuizGenerator("physics", 2, RateLimitedStore(), rate_limiter=limiter)
+    generator.llm = FakeLLM(markdown=False)
+
+    async def main():
+        earlier_job = asyncio.ensure_future(limiter.aacquire(priority=INTERACTIVE))
+        await asyncio.sleep(0)
+        quiz = await asyncio.wait_for(generator.agenerate_quiz(), timeout=10)
+        await earlier_job
+        return quiz
+
+    assert len(asyncio.run(main())) == 2
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from components.resources import ResourceCache, SessionCache
+
+
+def slow_factory(started, release, calls, value):
+    """
+    A factory that signals when it runs and blocks until released, like a client's auth handshake.
+    """
+    def factory():
+        calls.append(value)
+        started.set()
+        release.wait(timeout=5)
+        return value
+    return factory
+
+
+def test_slow_factory_does_not_block_other_keys():
+    cache = ResourceCache()
+    cache.get("cached", lambda: "cached")
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    builder = threading.Thread(target=cache.get, args=("slow", slow_factory(started, release, calls, "slow")))
+    builder.start()
+    assert started.wait(timeout=5)
+
+    begin = time.perf_counter()
+    assert cache.get("cached", lambda: "other") == "cached"
+    assert cache.get("fresh", lambda: "fresh") == "fresh"
+    assert time.perf_counter() - begin < 1
+
+    release.set()
+    builder.join(timeout=5)
+    assert cache.get("slow", lambda: "other") == "slow"
+
+
+def test_concurrent_misses_build_once():
+    cache = ResourceCache()
+    started, release, calls = threading.Event(), threading.Event(), []
+    factory = slow_factory(started, release, calls, "client")
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get("client", factory))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == ["client"] * 4
+    assert calls == ["client"]
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 1}
+
+
+def test_session_factory_does_not_block_other_sessions():
+    cache = SessionCache()
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    builder = threading.Thread(target=cache.get, args=("s1", "index", slow_factory(started, release, calls, "s1")))
+    builder.start()
+    assert started.wait(timeout=5)
+
+    begin = time.perf_counter()
+    assert cache.get("s2", "index", lambda: "s2") == "s2"
+    assert time.perf_counter() - begin < 1
+
+    release.set()
+    builder.join(timeout=5)
+    assert cache.get("s1", "index", lambda: "other") == "s1"
+    assert calls == ["s1"]
+
+
+def test_peek_never_calls_the_factory():
+    cache = ResourceCache()
+    assert cache.peek("client") is None
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0}
+
+    cache.get("client", lambda: "client")
+    assert cache.peek("client") == "client"
@@ -0,0 +1,152 @@
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddingClient
+from components.chroma_collection import ChromaCollectionCreator
+from components.document_processor import DocumentProcessor
+from components.numpy_collection import NumpyCollectionCreator
+
+
+class FakeProcessor:
+    """
+    A DocumentProcessor stand-in serving fixed page texts per document hash.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.document_hashes = list(pages)
+        self.pages_read = 0
+
+    document_set_id = DocumentProcessor.document_set_id
+
+    def page_count(self, doc_hashes=None) -> int:
+        return sum(len(self.pages[doc_hash]) for doc_hash in doc_hashes)
+
+    def iter_pages(self, doc_hashes=None):
+        for doc_hash in doc_hashes:
+            for page_number, text in enumerate(self.pages[doc_hash]):
+                self.pages_read += 1
+                if text.strip():
+                    yield Document(page_content=text, metadata={"page": page_number, "doc_hash": doc_hash})
+
+
+def test_documents_without_chunks_are_recorded_as_indexed(tmp_path):
+    processor = FakeProcessor({
+        "a" * 64: ["Photons carry the energy of light between atoms."],
+        "b" * 64: ["   "],
+    })
+
+    def create():
+        creator = NumpyCollectionCreator(
+            processor, FakeEmbeddingClient(), persist_directory=str(tmp_path), show_status=False
+        )
+        creator.create_chroma_collection()
+        return creator
+
+    creator = create()
+    assert creator.indexed_document_hashes() == set(processor.document_hashes)
+    assert creator.registry.complete_hashes() == {"a" * 64, "b" * 64}
+
+    # A later session finds both documents indexed and reads no page again
+    pages_read = processor.pages_read
+    creator = create()
+    assert processor.pages_read == pages_read
+    assert creator.chunk_count() == 1
+
+
+def test_documents_being_ingested_by_another_session_are_kept(tmp_path):
+    from components.text_splitter import ChunkSplitter
+
+    ingesting = FakeProcessor({"a" * 64: ["Photons carry the energy of light between atoms."]})
+    uploaded = FakeProcessor({"b" * 64: ["Enzymes speed up the reactions of a cell."]})
+
+    def creator(processor, **kwargs):
+        return ChromaCollectionCreator(
+            processor, FakeEmbeddingClient(), persist_directory=str(tmp_path), show_status=False, **kwargs
+        )
+
+    # A session claimed its document and stored some of its chunks, but didn't finish yet
+    session = creator(ingesting)
+    session._open()
+    session.registry.claim(ingesting.document_hashes)
+    session._text_splitter = ChunkSplitter()
+    session._chunk_counts = {}
+    chunks = list(session._split_pages(ingesting.iter_pages(ingesting.document_hashes)))
+    session._upsert_chunks(chunks, session.embed_model.embed_documents([chunk.page_content for chunk in chunks]))
+
+    creator(uploaded).create_chroma_collection()
+    assert session.stored_document_hashes() == {"a" * 64, "b" * 64}
+
+    # Once its lease ran out, the ingestion counts as interrupted and its chunks are deleted
+    time.sleep(0.01)
+    creator(uploaded, lease_seconds=0).create_chroma_collection()
+    assert session.stored_document_hashes() == {"b" * 64}
+
+
+def test_sessions_share_the_collection_but_only_search_their_documents(tmp_path):
+    light = FakeProcessor({"a" * 64: ["Photons carry the energy of light between atoms."]})
+    cells = FakeProcessor({"b" * 64: ["Enzymes speed up the reactions of a cell."]})
+
+    def creator(processor, creator_class, **kwargs):
+        return creator_class(
+            processor, FakeEmbeddingClient(), persist_directory=str(tmp_path / creator_class.__name__),
+            show_status=False, **kwargs
+        )
+
+    for creator_class in (ChromaCollectionCreator, NumpyCollectionCreator):
+        first, second = creator(light, creator_class), creator(cells, creator_class)
+        first.create_chroma_collection()
+        second.create_chroma_collection()
+
+        for session, doc_hash in ((first, "a" * 64), (second, "b" * 64)):
+            _, chunks = session.retrieve_with_vectors("energy of a cell", k=5)
+            assert [chunk.metadata["doc_hash"] for chunk, _ in chunks] == [doc_hash]
+            documents = session.as_retriever(k=5).invoke("energy of a cell")
+            assert [document.metadata["doc_hash"] for document in documents] == [doc_hash]
+
+        # Another process opens a set from the shared registry
+        reopened = creator(DocumentProcessor(), creator_class)
+        assert reopened.open_document_set(light.document_set_id())
+        assert reopened.document_hashes == ["a" * 64]
+
+        # Documents nobody used within the TTL are deleted, those of the current upload are kept
+        creator(cells, creator_class, ttl_seconds=-1).create_chroma_collection()
+        assert reopened.registry.complete_hashes() == {"b" * 64}
+        assert not creator(DocumentProcessor(), creator_class).open_document_set(light.document_set_id())
+
+
+def test_numpy_indexes_saved_by_several_creators_keep_every_document(tmp_path):
+    light = FakeProcessor({"a" * 64: ["Photons carry the energy of light between atoms."]})
+    cells = FakeProcessor({"b" * 64: ["Enzymes speed up the reactions of a cell."]})
+    first, second = (
+        NumpyCollectionCreator(processor, FakeEmbeddingClient(), persist_directory=str(tmp_path), show_status=False)
+        for processor in (light, cells)
+    )
+    # Both creators open the index before either saved its document
+    first._open()
+    second._open()
+    first.create_chroma_collection()
+    second.create_chroma_collection()
+
+    reopened = NumpyCollectionCreator(DocumentProcessor(), FakeEmbeddingClient(), persist_directory=str(tmp_path))
+    reopened._open()
+    assert reopened.stored_document_hashes() == {"a" * 64, "b" * 64}
+
+
+def test_chunks_shared_by_documents_survive_the_deletion_of_one_of_them(tmp_path):
+    text = "Photons carry the energy of light between atoms."
+    both = FakeProcessor({"a" * 64: [text], "b" * 64: [text]})
+    creator = NumpyCollectionCreator(both, FakeEmbeddingClient(), persist_directory=str(tmp_path), show_status=False)
+    creator.create_chroma_collection()
+    assert creator.registry.complete_hashes() == {"a" * 64, "b" * 64}
+    assert creator.stored_document_hashes() == {"a" * 64, "b" * 64}
+
+    # Deleting the first document keeps the chunk of the second one
+    second = FakeProcessor({"b" * 64: [text]})
+    creator = NumpyCollectionCreator(
+        second, FakeEmbeddingClient(), persist_directory=str(tmp_path), show_status=False, ttl_seconds=-1
+    )
+    creator.create_chroma_collection()
+    _, chunks = creator.retrieve_with_vectors("energy", k=5)
+    assert [chunk.page_content for chunk, _ in chunks] == [text]